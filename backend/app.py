@@ -1,8 +1,13 @@
 import os
 
+# Imported first so the startup report can time every other import
+from startup import mark_app_ready
+
 # Import your app
 from routes import app
 
+mark_app_ready()
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8080))
     debug = os.environ.get("DEBUG", "False").lower() == "true"
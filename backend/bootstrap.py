@@ -0,0 +1,45 @@
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Shared by all requests; each page load uses up to three threads
+QUERY_THREADS = int(os.getenv("QUERY_THREADS", 16))
+_executor = ThreadPoolExecutor(max_workers=QUERY_THREADS, thread_name_prefix="books-query")
+
+
+def _submit(function, *args):
+    # Run in a copy of the request's context so the request deadline
+    # (pymongo.timeout) also applies inside the worker thread
+    context = contextvars.copy_context()
+    return _executor.submit(context.run, function, *args)
+
+
+# 📌 Start loading one page of books, its total and (optionally) read/unread
+# totals concurrently; call the returned function to wait for the payload
+def start_books_page(repository, user, page, per_page, sort, order, include_stats=False):
+    skip = (page - 1) * per_page
+    total_future = _submit(repository.count_books, user)
+    books_future = _submit(repository.list_books, user, skip, per_page, sort, order)
+    read_future = _submit(repository.count_read_books, user) if include_stats else None
+
+    def result():
+        total_books = total_future.result()
+        payload = {
+            "books": books_future.result(),
+            "page": page,
+            "per_page": per_page,
+            "sort": sort,
+            "order": order,
+            "total": total_books,
+            "pages": (total_books + per_page - 1) // per_page
+        }
+        if read_future is not None:
+            read_books = read_future.result()
+            payload["stats"] = {"total": total_books, "read": read_books, "unread": total_books - read_books}
+        return payload
+
+    return result
@@ -0,0 +1,192 @@
+import io
+import os
+import threading
+import uuid
+from dotenv import load_dotenv
+from flask import request, Response
+from werkzeug.datastructures import ContentRange
+
+# Load environment variables
+load_dotenv()
+
+COVER_MAX_BYTES = int(os.getenv("COVER_MAX_BYTES", 5 * 1024 * 1024))
+# Decoded size limit, so a small file cannot expand into a huge bitmap
+COVER_MAX_PIXELS = int(os.getenv("COVER_MAX_PIXELS", 25_000_000))
+# Pillow format -> content type stored with the cover
+COVER_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif"}
+# Cover and thumbnail URLs carry the cover id (?v=<cover id>), and a new upload gets a
+# new id, so a versioned URL never changes content and may be cached forever.
+# Unversioned or outdated URLs are revalidated; the ETag (the cover id) makes that a 304.
+COVER_CACHE_CONTROL = "private, max-age=31536000, immutable"
+COVER_REVALIDATE_CACHE_CONTROL = "private, no-cache"
+# Largest request body accepted (a cover plus multipart overhead); larger ones get a 413
+MAX_REQUEST_BYTES = COVER_MAX_BYTES + 64 * 1024
+STREAM_CHUNK_BYTES = 256 * 1024
+
+THUMBNAIL_SIZES = {64, 128, 256}
+THUMBNAIL_CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR", "thumbnail_cache")
+THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv("THUMBNAIL_CACHE_MAX_MB", 200)) * 1024 * 1024
+
+
+# 📌 Small reference stored on the book instead of the image itself
+def cover_reference(cover_id, content_type, length):
+    return {"id": cover_id, "content_type": content_type, "length": length}
+
+
+def stream_file(file, start, stop):
+    file.seek(start)
+    remaining = stop - start
+    while remaining > 0:
+        chunk = file.read(min(STREAM_CHUNK_BYTES, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
+
+
+# 📌 Check an upload really is a supported image; returns its content type.
+# The client-declared mimetype is not trusted. Raises ValueError with a user-facing message.
+def cover_content_type(stream):
+    # Pillow is only needed once a cover is actually uploaded
+    from PIL import Image
+
+    try:
+        with Image.open(stream) as image:
+            content_type = COVER_FORMATS.get(image.format)
+            if content_type is None:
+                raise ValueError("Cover must be a JPEG, PNG, WebP or GIF image")
+            if image.width * image.height > COVER_MAX_PIXELS:
+                raise ValueError(f"Cover must be at most {COVER_MAX_PIXELS // 1_000_000} megapixels")
+            # Reads the whole file, so truncated and corrupt images fail here
+            image.verify()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ValueError("Cover is not a valid image")
+    finally:
+        stream.seek(0)
+    return content_type
+
+
+def cover_cache_control(cover_id):
+    if request.args.get("v") == cover_id:
+        return COVER_CACHE_CONTROL
+    return COVER_REVALIDATE_CACHE_CONTROL
+
+
+# 📌 Stream a stored cover, honouring If-None-Match and single byte ranges
+def cover_response(file, cover):
+    etag = cover["id"]
+    length = file.length
+    byte_range = request.range.range_for_length(length) if request.range else None
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif byte_range is None and request.range and len(request.range.ranges) == 1:
+        # A single range that starts past the end cannot be served
+        response = Response(status=416)
+        response.content_range = ContentRange("bytes", None, None, length)
+    elif byte_range is None:
+        response = Response(stream_file(file, 0, length), mimetype=cover["content_type"])
+        response.content_length = length
+    else:
+        start, stop = byte_range
+        response = Response(stream_file(file, start, stop), status=206, mimetype=cover["content_type"])
+        response.content_length = stop - start
+        response.content_range = ContentRange("bytes", start, stop, length)
+    response.set_etag(etag)
+    response.headers["Accept-Ranges"] = "bytes"
+    response.headers["Cache-Control"] = cover_cache_control(etag)
+    return response
+
+
+def make_thumbnail(data, size):
+    # Pillow is only needed once a thumbnail is actually requested
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.thumbnail((size, size))
+        output = io.BytesIO()
+        image.convert("RGB").save(output, format="JPEG", quality=85, optimize=True)
+        return output.getvalue()
+
+
+class ThumbnailCache:
+    # Thumbnails on local disk, evicted least recently used first once the
+    # directory grows past max_bytes. Reads bump the file's mtime.
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total_bytes = None
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.jpg")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def put(self, key, data):
+        os.makedirs(self.directory, exist_ok=True)
+        # Write then rename so other workers never read a partial file
+        temp_path = os.path.join(self.directory, f".{uuid.uuid4().hex}.tmp")
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, self._path(key))
+
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = self._scan_size()
+            else:
+                self.total_bytes += len(data)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".jpg"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        # Evict down to 90% so we do not rescan on every insert
+        target = self.max_bytes * 0.9
+        for _, size, name in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+                total -= size
+            except OSError:
+                pass
+        self.total_bytes = total
+
+
+thumbnail_cache = ThumbnailCache(THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_MAX_BYTES)
+
+
+def get_thumbnail(repository, cover_id, size):
+    key = f"{cover_id}_{size}"
+    thumbnail = thumbnail_cache.get(key)
+    if thumbnail is None:
+        file = repository.open_cover(cover_id)
+        if file is None:
+            return None
+        thumbnail = make_thumbnail(file.read(), size)
+        thumbnail_cache.put(key, thumbnail)
+    return thumbnail
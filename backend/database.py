@@ -1,13 +1,17 @@
 from pymongo import MongoClient
 from dotenv import load_dotenv
 import os
+from slow_queries import event_listeners
 
 # Load environment variables
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
 
-client = MongoClient(MONGO_URI)  # Connect to MongoDB
+# connect=False: no sockets until the first query, so gunicorn can fork after import
+client = MongoClient(MONGO_URI, connect=False, event_listeners=event_listeners())  # Connect to MongoDB
 db = client["myLibraryDB"]  # Database Name
 books_collection = db["books"]
 users_collection = db["users"]  # ✅ New Users Collection
+refresh_tokens_collection = db["refresh_tokens"]
+revoked_tokens_collection = db["revoked_tokens"]  # Access tokens ended by /logout
@@ -0,0 +1,77 @@
+import os
+import time
+from dotenv import load_dotenv
+from flask import request, jsonify, g
+from werkzeug.exceptions import HTTPException
+from pymongo.errors import PyMongoError, ConnectionFailure, ServerSelectionTimeoutError
+
+# Load environment variables
+load_dotenv()
+
+# Remaining time budget sent by the client, in milliseconds
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+DEFAULT_REQUEST_TIMEOUT_MS = int(os.getenv("DEFAULT_REQUEST_TIMEOUT_MS", 10000))
+MAX_REQUEST_TIMEOUT_MS = int(os.getenv("MAX_REQUEST_TIMEOUT_MS", 30000))
+# Long-lived streams have no deadline
+EXEMPT_ENDPOINTS = {"events", "static"}
+
+
+def request_budget_ms():
+    try:
+        budget = int(request.headers.get(DEADLINE_HEADER, DEFAULT_REQUEST_TIMEOUT_MS))
+    except ValueError:
+        budget = DEFAULT_REQUEST_TIMEOUT_MS
+    return min(budget, MAX_REQUEST_TIMEOUT_MS)
+
+
+def remaining_seconds():
+    deadline = g.get("deadline")
+    if deadline is None:
+        return None
+    return max(0, deadline - time.monotonic())
+
+
+# 📌 Status for an error a route could not handle: 504 when storage ran out of time,
+# 503 when the database cannot be reached, so clients can tell an overloaded or
+# unavailable backend (retry later, open the circuit) from a bug (500)
+def error_status(e):
+    if isinstance(e, HTTPException):
+        # e.g. 413 from MAX_CONTENT_LENGTH, raised when a route reads the body
+        return e.code
+    if isinstance(e, ServerSelectionTimeoutError):
+        return 503
+    if isinstance(e, TimeoutError) or (isinstance(e, PyMongoError) and e.timeout):
+        return 504
+    if isinstance(e, ConnectionFailure):
+        return 503
+    return 500
+
+
+# 📌 Carry the client's deadline into every storage call the route makes.
+# The repository turns it into maxTimeMS / socket timeouts (pymongo.timeout).
+def init_deadlines(app, repository):
+    # Storage errors raised outside a route's own try block, e.g. by the
+    # token blocklist lookup inside @jwt_required
+    @app.errorhandler(PyMongoError)
+    def storage_error(e):
+        return jsonify({"message": f"Database error: {str(e)}"}), error_status(e)
+
+    @app.before_request
+    def start_deadline():
+        if request.endpoint is None or request.endpoint in EXEMPT_ENDPOINTS:
+            return None
+
+        budget_ms = request_budget_ms()
+        if budget_ms <= 0:
+            return jsonify({"message": "Request deadline already expired"}), 504
+
+        g.deadline = time.monotonic() + budget_ms / 1000
+        g.deadline_scope = repository.deadline(budget_ms / 1000)
+        g.deadline_scope.__enter__()
+        return None
+
+    @app.teardown_request
+    def end_deadline(exc):
+        scope = g.pop("deadline_scope", None)
+        if scope is not None:
+            scope.__exit__(None, None, None)
@@ -0,0 +1,146 @@
+import json
+import os
+import queue
+import threading
+import itertools
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Use MongoDB change streams (replica set and STORAGE_ENGINE=mongo required) instead of the
+# in-process publisher. With several workers, change streams let every worker see every write.
+USE_CHANGE_STREAMS = os.getenv("USE_CHANGE_STREAMS", "False").lower() == "true"
+SSE_KEEPALIVE_SECONDS = int(os.getenv("SSE_KEEPALIVE_SECONDS", 15))
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", 3000))
+SUBSCRIBER_QUEUE_SIZE = 100
+# Open streams allowed per process (0 = no limit). Under gthread each stream holds a
+# thread for as long as the client is connected; gunicorn.conf.py sets this.
+SSE_MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", 0))
+# Retry-After sent when every stream slot is taken
+SSE_BUSY_RETRY_SECONDS = 30
+
+# user email -> set of subscriber queues (one per open stream)
+_subscribers = {}
+_subscribers_lock = threading.Lock()
+_event_ids = itertools.count(1)
+_open_streams = 0
+
+_watcher_thread = None
+_watcher_lock = threading.Lock()
+
+
+# 📌 Reserve a stream slot before opening /events; release it when the response closes
+def acquire_stream():
+    global _open_streams
+    with _subscribers_lock:
+        if SSE_MAX_STREAMS and _open_streams >= SSE_MAX_STREAMS:
+            return False
+        _open_streams += 1
+        return True
+
+
+def release_stream():
+    global _open_streams
+    with _subscribers_lock:
+        _open_streams -= 1
+
+
+def subscribe(user):
+    q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    with _subscribers_lock:
+        _subscribers.setdefault(user, set()).add(q)
+    if USE_CHANGE_STREAMS:
+        start_change_stream_watcher()
+    return q
+
+
+def unsubscribe(user, q):
+    with _subscribers_lock:
+        queues = _subscribers.get(user)
+        if queues is None:
+            return
+        queues.discard(q)
+        if not queues:
+            del _subscribers[user]
+
+
+def publish(user, event_type, book_id):
+    with _subscribers_lock:
+        queues = list(_subscribers.get(user, ()))
+    if not queues:
+        return
+
+    event = {"id": next(_event_ids), "type": event_type, "book_id": str(book_id)}
+    for q in queues:
+        try:
+            q.put_nowait(event)
+        except queue.Full:
+            # Slow consumer: it already has pending events, so it will refetch anyway
+            pass
+
+
+# 📌 Called by the write routes; a no-op when change streams publish instead
+def book_changed(user, event_type, book_id):
+    if not USE_CHANGE_STREAMS:
+        publish(user, event_type, book_id)
+
+
+# 📌 MongoDB change stream watcher (one per process, started on first subscriber)
+def start_change_stream_watcher():
+    global _watcher_thread
+    with _watcher_lock:
+        if _watcher_thread is not None and _watcher_thread.is_alive():
+            return
+        _watcher_thread = threading.Thread(target=_watch_books, name="books-change-stream", daemon=True)
+        _watcher_thread.start()
+
+
+def _watch_books():
+    # Imported here so the in-memory storage engine never opens a MongoDB client
+    from database import books_collection
+
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+    operation_events = {"insert": "add", "update": "update", "replace": "update", "delete": "delete"}
+    resume_token = None
+
+    while True:
+        try:
+            # Delete events only carry the user when the collection has
+            # changeStreamPreAndPostImages enabled (MongoDB 6.0+)
+            with books_collection.watch(
+                pipeline,
+                full_document="updateLookup",
+                full_document_before_change="whenAvailable",
+                resume_after=resume_token,
+            ) as stream:
+                for change in stream:
+                    resume_token = stream.resume_token
+                    document = change.get("fullDocument") or change.get("fullDocumentBeforeChange") or {}
+                    user = document.get("user")
+                    if user:
+                        publish(user, operation_events[change["operationType"]], change["documentKey"]["_id"])
+        except Exception as e:
+            print(f"Change stream error, reconnecting: {str(e)}")
+            threading.Event().wait(SSE_RETRY_MS / 1000)
+
+
+def format_sse(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+# 📌 Generator backing the /events response
+def stream_events(user):
+    q = subscribe(user)
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        while True:
+            try:
+                event = q.get(timeout=SSE_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse(event)
+    finally:
+        unsubscribe(user, q)
@@ -0,0 +1,191 @@
+import argparse
+import bcrypt
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone, timedelta
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+# Synthetic library generator for scale testing:
+#   python generate_library.py --users 1000 --books 1000000 --workers 8
+# Writes into the same database and schema the API uses, so point MONGO_URI
+# at a scratch deployment.
+
+# Load environment variables
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI")
+DATABASE_NAME = "myLibraryDB"
+
+# Same genres the Streamlit add/edit forms offer
+GENRES = [
+    "Fiction", "Non-Fiction", "Science Fiction", "Fantasy",
+    "Mystery", "Thriller", "Romance", "Biography",
+    "History", "Science", "Self-Help", "Other"
+]
+GENRE_WEIGHTS = [30, 12, 10, 10, 9, 8, 8, 4, 4, 2, 2, 1]
+
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda",
+    "David", "Elizabeth", "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica",
+    "Thomas", "Sarah", "Charles", "Karen", "Ayesha", "Hiroshi", "Olga", "Kwame",
+    "Lucia", "Mateo", "Priya", "Omar", "Ingrid", "Chen", "Fatima", "Sven"
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+    "Rodriguez", "Martinez", "Hernandez", "Lopez", "Wilson", "Anderson", "Taylor", "Thomas",
+    "Moore", "Jackson", "Martin", "Lee", "Khan", "Tanaka", "Ivanova", "Mensah",
+    "Rossi", "Silva", "Sharma", "Haddad", "Larsen", "Wang", "Okafor", "Novak"
+]
+TITLE_ADJECTIVES = [
+    "Silent", "Last", "Hidden", "Broken", "Golden", "Forgotten", "Endless", "Crimson",
+    "Distant", "Secret", "Burning", "Lost", "Quiet", "Wild", "Hollow", "Bright"
+]
+TITLE_NOUNS = [
+    "River", "Kingdom", "Garden", "Empire", "Shadow", "Promise", "Winter", "Ocean",
+    "Machine", "Letter", "Mountain", "House", "Star", "Road", "Library", "Storm"
+]
+TITLE_PATTERNS = [
+    "The {adj} {noun}",
+    "{noun} of the {adj} {noun2}",
+    "A {adj} {noun}",
+    "The {noun} and the {noun2}",
+    "{adj} {noun}s",
+    "Beyond the {noun}"
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Populate myLibraryDB with synthetic users and books")
+    parser.add_argument("--users", type=int, default=100, help="Number of users to create")
+    parser.add_argument("--books", type=int, default=100000, help="Total number of books to create")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Parallel insert processes")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Documents per insert_many")
+    parser.add_argument("--rate", type=float, default=0, help="Max books inserted per second across all workers (0 = unlimited)")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for books per user (0 = uniform)")
+    parser.add_argument("--password", default="password123", help="Password shared by all generated users")
+    parser.add_argument("--email-domain", default="example.com")
+    parser.add_argument("--days", type=int, default=3 * 365, help="Spread created_at over this many past days")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--drop", action="store_true", help="Delete previously generated users and their books first")
+    return parser.parse_args()
+
+
+def user_email(index, domain):
+    return f"loadtest{index:07d}@{domain}"
+
+
+def random_title(rng):
+    return rng.choice(TITLE_PATTERNS).format(
+        adj=rng.choice(TITLE_ADJECTIVES),
+        noun=rng.choice(TITLE_NOUNS),
+        noun2=rng.choice(TITLE_NOUNS)
+    )
+
+
+def random_book(rng, user, now, days):
+    # Publication years lean recent, with a long tail of classics
+    year = max(1450, now.year - int(rng.expovariate(1 / 25)))
+    return {
+        "title": random_title(rng),
+        "author": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        "year": year,
+        "genre": rng.choices(GENRES, weights=GENRE_WEIGHTS)[0],
+        "read": rng.random() < 0.4,
+        "user": user,
+        "created_at": now - timedelta(seconds=rng.uniform(0, days * 86400))
+    }
+
+
+def create_users(db, args):
+    # Hash once: bcrypt is deliberately slow and every user shares the password
+    hashed_password = bcrypt.hashpw(args.password.encode("utf-8"), bcrypt.gensalt())
+    now = datetime.now(timezone.utc)
+    emails = [user_email(i, args.email_domain) for i in range(args.users)]
+
+    # In chunks, so no $in list or insert batch nears MongoDB's 16 MB document limit
+    for start in range(0, len(emails), args.batch_size):
+        chunk = emails[start:start + args.batch_size]
+        existing = {user["email"] for user in db["users"].find({"email": {"$in": chunk}}, {"email": 1})}
+        new_users = [
+            {"email": email, "password": hashed_password, "created_at": now}
+            for email in chunk if email not in existing
+        ]
+        if new_users:
+            db["users"].insert_many(new_users, ordered=False)
+    return emails
+
+
+def insert_books(worker_id, count, emails, weights, args):
+    # Each process opens its own client; MongoClient is not fork-safe
+    client = MongoClient(MONGO_URI)
+    books = client[DATABASE_NAME]["books"]
+    seed = None if args.seed is None else args.seed + worker_id
+    rng = random.Random(seed)
+    cumulative_weights = list(itertools.accumulate(weights))
+    now = datetime.now(timezone.utc)
+    worker_rate = args.rate / args.workers if args.rate else 0
+
+    inserted = 0
+    started = time.monotonic()
+    while inserted < count:
+        size = min(args.batch_size, count - inserted)
+        users = rng.choices(emails, cum_weights=cumulative_weights, k=size)
+        books.insert_many([random_book(rng, user, now, args.days) for user in users], ordered=False)
+        inserted += size
+
+        if worker_rate:
+            # Sleep until this worker is back under its share of the rate
+            ahead = inserted / worker_rate - (time.monotonic() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    client.close()
+    return inserted
+
+
+def main():
+    args = parse_args()
+    client = MongoClient(MONGO_URI)
+    db = client[DATABASE_NAME]
+
+    if args.drop:
+        generated = {"$regex": f"^loadtest\\d+@{args.email_domain.replace('.', '[.]')}$"}
+        db["books"].delete_many({"user": generated})
+        db["users"].delete_many({"email": generated})
+        print("Removed previously generated users and books")
+
+    emails = create_users(db, args)
+    client.close()
+    print(f"{len(emails)} users ready")
+
+    # Zipf-like skew: a few heavy readers own most of the books
+    rng = random.Random(args.seed)
+    weights = [1 / (rank ** args.skew) for rank in range(1, len(emails) + 1)]
+    rng.shuffle(weights)
+
+    per_worker = [args.books // args.workers] * args.workers
+    for i in range(args.books % args.workers):
+        per_worker[i] += 1
+
+    started = time.monotonic()
+    total = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(insert_books, worker_id, count, emails, weights, args)
+            for worker_id, count in enumerate(per_worker) if count
+        ]
+        for future in as_completed(futures):
+            total += future.result()
+            elapsed = time.monotonic() - started
+            print(f"{total}/{args.books} books inserted ({total / elapsed:.0f} books/s)")
+
+    print(f"Done: {total} books for {len(emails)} users in {time.monotonic() - started:.1f}s")
+    print("Build any missing indexes with: python storage.py ensure-indexes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import math
+import os
+from dotenv import load_dotenv
+
+# Production server settings, loaded with:
+#   cd backend && python storage.py ensure-indexes && gunicorn -c gunicorn.conf.py app:app
+# Every value can be overridden from the environment.
+
+# Load environment variables (the same .env the app reads)
+load_dotenv()
+
+
+def available_cpus():
+    # Respect container CPU quotas (cgroup v2), not just the host's core count
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+cpus = available_cpus()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+
+# gthread handles Mongo I/O waits with threads; gevent (pip install gevent) runs each
+# /events stream on a greenlet instead of a thread
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+
+# bcrypt in /login and /register is CPU-bound, so concurrency tracks CPUs (cpus + 1
+# workers); the rest of a request is mostly Mongo round trips, so threads cover the
+# I/O wait. GUNICORN_IO_RATIO is the fraction of request time spent waiting on I/O.
+#
+# The default deployment runs ONE worker: several need USE_CHANGE_STREAMS=true (see
+# below). That worker then gets the threads all cpus + 1 workers would have had;
+# bcrypt releases the GIL while hashing, so its threads still use every CPU.
+io_ratio = min(float(os.environ.get("GUNICORN_IO_RATIO", 0.8)), 0.95)
+use_change_streams = os.environ.get("USE_CHANGE_STREAMS", "False").lower() == "true"
+memory_storage = os.environ.get("STORAGE_ENGINE", "mongo").lower() == "memory"
+if memory_storage:
+    # The in-memory engine lives inside one process
+    workers = 1
+elif use_change_streams:
+    workers = int(os.environ.get("WEB_CONCURRENCY", cpus + 1))
+else:
+    # The in-process event publisher only reaches /events streams on the worker that
+    # handled the write; other workers' sessions would never see the change.
+    # Some platforms set WEB_CONCURRENCY themselves, so it is overridden, not an error.
+    workers = 1
+threads_per_worker = min(32, max(2, math.ceil(1 / (1 - io_ratio))))
+request_threads = int(os.environ.get("GUNICORN_THREADS", threads_per_worker * max(1, (cpus + 1) // workers)))
+if worker_class == "gthread":
+    # Every open /events stream holds a thread until its session ends, so streams get
+    # threads of their own on top of the request threads. The app turns away streams
+    # past this many (clients poll instead), so requests always have a thread.
+    sse_streams = max(1, int(os.environ.get("SSE_MAX_STREAMS", 64)))
+    os.environ["SSE_MAX_STREAMS"] = str(sse_streams)
+    threads = request_threads + sse_streams
+else:
+    # Async workers give each stream a greenlet, not a thread
+    sse_streams = None
+    threads = request_threads
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+# Recycle workers periodically so slow leaks cannot build up; jitter avoids all
+# workers restarting at once. Never with the in-memory engine: a recycled worker is
+# forked from the master's empty repository, so every user and book would be lost.
+if memory_storage:
+    max_requests = 0
+    max_requests_jitter = 0
+else:
+    max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 2000))
+    max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Load the app once in the master so workers fork with it already imported.
+# database.py creates its MongoClient with connect=False, so no sockets or
+# monitor threads exist until a worker runs its first query.
+# SIGHUP reloads config and workers but not code when preloading; set
+# GUNICORN_PRELOAD=false to have HUP pick up new code too.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "True").lower() == "true"
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    streams = f", up to {sse_streams} of them /events streams" if sse_streams else ""
+    server.log.info(
+        f"Starting {workers} {worker_class} workers x {threads} threads{streams} "
+        f"({cpus} CPUs, I/O ratio {io_ratio})"
+    )
+    if not use_change_streams and int(os.environ.get("WEB_CONCURRENCY", 1)) > 1:
+        server.log.warning("WEB_CONCURRENCY ignored: more than one worker needs USE_CHANGE_STREAMS=true")
+
+
+def post_fork(server, worker):
+    # Anything that must not be shared across fork is created lazily per worker:
+    # the Mongo connection pool, the slow-query recorder and the change stream watcher
+    server.log.info(f"Worker {worker.pid} ready")
+
+
+def worker_abort(worker):
+    worker.log.warning(f"Worker {worker.pid} timed out and was aborted")
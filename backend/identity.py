@@ -0,0 +1,28 @@
+import os
+from dotenv import load_dotenv
+from flask import request
+from flask_jwt_extended import decode_token
+
+# Load environment variables
+load_dotenv()
+
+# Comma-separated emails allowed to use admin-only features
+ADMIN_EMAILS = {
+    email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()
+}
+
+
+# Identity from the bearer token, for hooks that run before @jwt_required.
+# Decoding is a cheap HMAC check; routes still do full verification themselves.
+def request_identity():
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.startswith("Bearer "):
+        return None
+    try:
+        return decode_token(auth_header[len("Bearer "):])["sub"]
+    except Exception:
+        return None
+
+
+def is_admin(identity):
+    return bool(identity) and identity.lower() in ADMIN_EMAILS
@@ -0,0 +1,134 @@
+import cProfile
+import hashlib
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from flask import request, g
+from identity import request_identity, is_admin
+
+# Load environment variables
+load_dotenv()
+
+# Fraction of requests to profile (0 disables sampling; admins can still use the header)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_HEADER = "X-Profile"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 200))
+# Stack sampling interval for the collapsed-stack (flamegraph) output
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_MS", 1)) / 1000
+# Long-lived streams would be profiled for as long as the client stays connected
+EXEMPT_ENDPOINTS = {"events", "static"}
+
+
+class StackSampler:
+    # Samples one thread's stack on a timer and counts folded stacks,
+    # in the "frame;frame;frame count" format flamegraph.pl and speedscope read
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+def should_profile():
+    if request.headers.get(PROFILE_HEADER) == "1" and is_admin(request_identity()):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def user_hash():
+    identity = request_identity()
+    if not identity:
+        return "anonymous"
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:12]
+
+
+def rotate_profiles():
+    files = sorted(
+        (os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR)),
+        key=os.path.getmtime
+    )
+    for path in files[:-PROFILE_MAX_FILES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def write_profile(profile, duration_ms):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    # Tags live in the file name so profiles can be grouped with plain shell globs
+    base = os.path.join(
+        PROFILE_DIR,
+        f"{timestamp}_{request.endpoint}_{profile['user']}_{duration_ms:.0f}ms"
+    )
+    profile["profiler"].dump_stats(f"{base}.pstats")
+    with open(f"{base}.folded", "w") as f:
+        f.write(profile["sampler"].collapsed())
+    rotate_profiles()
+
+
+# 📌 Register the profiling hooks
+def init_profiling(app):
+    @app.before_request
+    def start_profile():
+        if request.endpoint is None or request.endpoint in EXEMPT_ENDPOINTS or not should_profile():
+            return None
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this interpreter
+            return None
+        sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_SECONDS)
+        sampler.start()
+        g.profile = {
+            "profiler": profiler,
+            "sampler": sampler,
+            "user": user_hash(),
+            "started": time.perf_counter()
+        }
+        return None
+
+    @app.teardown_request
+    def finish_profile(exc):
+        profile = g.pop("profile", None)
+        if profile is None:
+            return
+        profile["profiler"].disable()
+        profile["sampler"].stop()
+        duration_ms = (time.perf_counter() - profile["started"]) * 1000
+        try:
+            write_profile(profile, duration_ms)
+        except Exception as e:
+            print(f"Failed to write request profile: {str(e)}")
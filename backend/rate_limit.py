@@ -0,0 +1,159 @@
+import math
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from flask import request, jsonify
+from identity import request_identity
+
+# Load environment variables
+load_dotenv()
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+# Budgets are "<burst>/<seconds>": e.g. 10/60 allows a burst of 10, refilled over a minute
+AUTH_RATE_LIMIT = os.getenv("AUTH_RATE_LIMIT", "10/60")
+DATA_RATE_LIMIT = os.getenv("DATA_RATE_LIMIT", "120/60")
+# Per-account login budget shared by all IPs, so a botnet cannot brute-force one email.
+# Anyone can spend it, which also locks the account owner out; keeping it looser than
+# AUTH_RATE_LIMIT means that takes more than one IP. Empty turns it off.
+AUTH_EMAIL_RATE_LIMIT = os.getenv("AUTH_EMAIL_RATE_LIMIT", "30/60")
+# Number of proxies in front of the app that append to X-Forwarded-For (Railway: 1).
+# 0 ignores the header, since clients can put anything in it.
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", 0))
+# Optional Redis URL so all workers share one set of buckets (needs the redis package)
+RATE_LIMIT_STORAGE_URL = os.getenv("RATE_LIMIT_STORAGE_URL")
+
+# bcrypt-heavy routes get the tighter budget
+AUTH_ENDPOINTS = {"login", "register"}
+EXEMPT_ENDPOINTS = {"static"}
+
+
+def parse_rate(rate):
+    burst, seconds = rate.split("/")
+    capacity = float(burst)
+    return capacity, capacity / float(seconds)
+
+
+class MemoryBucketStore:
+    MAX_KEYS = 100000
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate):
+        now = time.monotonic()
+        with self.lock:
+            tokens, last = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * refill_rate)
+            if tokens >= 1:
+                self.buckets[key] = (tokens - 1, now)
+                allowed, retry_after = True, 0
+            else:
+                self.buckets[key] = (tokens, now)
+                allowed, retry_after = False, (1 - tokens) / refill_rate
+            if len(self.buckets) > self.MAX_KEYS:
+                self._evict(now, capacity, refill_rate)
+        return allowed, retry_after
+
+    def _evict(self, now, capacity, refill_rate):
+        # Buckets that would be full again carry no state worth keeping
+        full_after = capacity / refill_rate
+        self.buckets = {
+            key: (tokens, last) for key, (tokens, last) in self.buckets.items()
+            if now - last < full_after
+        }
+
+
+class RedisBucketStore:
+    # Refill and take a token atomically, using the Redis clock so workers agree
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local refill_rate = tonumber(ARGV[2])
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'last')
+    local tokens = tonumber(bucket[1]) or capacity
+    local last = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + (now - last) * refill_rate)
+    local allowed = 0
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    else
+        retry_after = (1 - tokens) / refill_rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'last', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill_rate))
+    return {allowed, tostring(retry_after)}
+    """
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_STORAGE_URL is set but the 'redis' package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(self.SCRIPT)
+
+    def consume(self, key, capacity, refill_rate):
+        allowed, retry_after = self.script(keys=[f"ratelimit:{key}"], args=[capacity, refill_rate])
+        return bool(allowed), float(retry_after)
+
+
+def client_ip():
+    # Each trusted proxy appends the address it received the request from, so the
+    # client is that many entries from the right; entries further left are client-supplied
+    if RATE_LIMIT_TRUSTED_PROXIES:
+        forwarded = [
+            ip.strip() for header in request.headers.getlist("X-Forwarded-For")
+            for ip in header.split(",") if ip.strip()
+        ]
+        if len(forwarded) >= RATE_LIMIT_TRUSTED_PROXIES:
+            return forwarded[-RATE_LIMIT_TRUSTED_PROXIES]
+    return request.remote_addr or "unknown"
+
+
+def too_many_requests(retry_after):
+    response = jsonify({"message": "Too many requests. Please try again later."})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+# 📌 Register the admission check; must run before any Mongo or bcrypt work
+def init_rate_limiting(app):
+    if not RATE_LIMIT_ENABLED:
+        return
+
+    store = RedisBucketStore(RATE_LIMIT_STORAGE_URL) if RATE_LIMIT_STORAGE_URL else MemoryBucketStore()
+    auth_capacity, auth_refill = parse_rate(AUTH_RATE_LIMIT)
+    email_rate = parse_rate(AUTH_EMAIL_RATE_LIMIT) if AUTH_EMAIL_RATE_LIMIT else None
+    data_capacity, data_refill = parse_rate(DATA_RATE_LIMIT)
+
+    @app.before_request
+    def check_rate_limit():
+        if request.method == "OPTIONS" or request.endpoint in EXEMPT_ENDPOINTS or request.endpoint is None:
+            return None
+
+        ip = client_ip()
+        if request.endpoint in AUTH_ENDPOINTS:
+            # Budgets are checked in order; the per-IP one first, so a rejected
+            # IP does not spend the account's budget
+            budgets = [(f"auth:ip:{ip}", auth_capacity, auth_refill)]
+            data = request.get_json(silent=True) or {}
+            if request.endpoint == "login" and email_rate and isinstance(data, dict) and isinstance(data.get("email"), str):
+                budgets.append((f"auth:email:{data['email'].lower()}", *email_rate))
+        else:
+            key = f"data:ip:{ip}"
+            identity = request_identity()
+            if identity:
+                key = f"data:user:{identity}"
+            budgets = [(key, data_capacity, data_refill)]
+
+        for key, capacity, refill_rate in budgets:
+            allowed, retry_after = store.consume(key, capacity, refill_rate)
+            if not allowed:
+                return too_many_requests(retry_after)
+        return None
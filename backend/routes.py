@@ -1,7 +1,17 @@
-from flask import Flask, request, jsonify
+from startup import init_startup_report
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-from flask_jwt_extended import create_access_token, jwt_required, JWTManager, get_jwt_identity, get_jwt
-from database import books_collection, users_collection
+from flask_jwt_extended import jwt_required, JWTManager, get_jwt_identity, get_jwt
+from events import SSE_BUSY_RETRY_SECONDS, acquire_stream, release_stream, book_changed, stream_events
+from rate_limit import init_rate_limiting
+from profiling import init_profiling
+from identity import is_admin
+from storage import STORAGE_ENGINE, SORT_FIELDS, get_repository
+from deadlines import init_deadlines, remaining_seconds, error_status
+from write_batcher import create_write_batcher
+from bootstrap import start_books_page
+from covers import COVER_MAX_BYTES, MAX_REQUEST_BYTES, THUMBNAIL_SIZES, cover_cache_control, cover_content_type, cover_reference, cover_response, get_thumbnail
+from tokens import REFRESH_TOKEN_EXPIRES, issue_tokens, rotate_tokens, revoke_family, revoke_access_token, is_token_revoked
 from bson import ObjectId
 import bcrypt
 import os
@@ -13,21 +23,37 @@ from datetime import datetime, timezone, timedelta
 load_dotenv()
 
 app = Flask(__name__)
+# Startup timing report (STARTUP_REPORT=true)
+init_startup_report(app)
 CORS(app)
 
 # Set JWT Secret Key
 app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY")  
 # Set token expiration (optional)
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1)
+# Long-lived refresh tokens so bcrypt runs once per device, not once per hour
+app.config["JWT_REFRESH_TOKEN_EXPIRES"] = REFRESH_TOKEN_EXPIRES
 jwt = JWTManager(app)
 
-# Token blocklist for logout functionality
-jwt_blocklist = set()
+# Reject oversized bodies (e.g. cover uploads) with a 413 before reading them
+app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_BYTES
 
+# Book and user storage (STORAGE_ENGINE=mongo or memory)
+repository = get_repository()
+# Coalesces concurrent add_book inserts when WRITE_COALESCING=true
+write_batcher = create_write_batcher(repository)
+
+# Rate limiting runs before every route, ahead of any Mongo or bcrypt work
+init_rate_limiting(app)
+# Sampled per-request profiling (PROFILE_SAMPLE_RATE, or X-Profile header from admins)
+init_profiling(app)
+# Client deadlines become maxTimeMS on every Mongo operation of the request
+init_deadlines(app, repository)
+
+# Token blocklist for logout functionality (revoked tokens are kept in storage)
 @jwt.token_in_blocklist_loader
 def check_if_token_in_blocklist(jwt_header, jwt_payload):
-    jti = jwt_payload["jti"]
-    return jti in jwt_blocklist
+    return is_token_revoked(jwt_payload)
 
 # Email validation function
 def is_valid_email(email):
@@ -55,7 +81,7 @@ def register():
             return jsonify({"message": "Password must be at least 8 characters long"}), 400
 
         # Check if user already exists
-        existing_user = users_collection.find_one({"email": email})
+        existing_user = repository.find_user(email)
         if existing_user:
             return jsonify({"message": "User already exists!"}), 400
 
@@ -63,14 +89,14 @@ def register():
         hashed_password = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
 
         # Store user in DB
-        users_collection.insert_one({
+        repository.create_user({
             "email": email, 
             "password": hashed_password,
             "created_at": datetime.now(timezone.utc)
         })
         return jsonify({"message": "User registered successfully!"}), 201
     except Exception as e:
-        return jsonify({"message": f"Registration error: {str(e)}"}), 500
+        return jsonify({"message": f"Registration error: {str(e)}"}), error_status(e)
 
 
 ### ✅ User Login Route
@@ -88,18 +114,26 @@ def login():
             return jsonify({"message": "Email and password are required"}), 400
 
         # Find user in DB
-        user = users_collection.find_one({"email": email})
+        user = repository.find_user(email)
         if not user:
             return jsonify({"message": "Invalid credentials"}), 401
 
         # Check password
-        if bcrypt.checkpw(password.encode("utf-8"), user["password"]):
-            access_token = create_access_token(identity=email)
-            return jsonify({"token": access_token}), 200
-        else:
+        if not bcrypt.checkpw(password.encode("utf-8"), user["password"]):
             return jsonify({"message": "Invalid credentials"}), 401
+        
+        # Optional bootstrap: first dashboard page and read/unread totals in the
+        # same response, queried concurrently while the tokens are issued
+        bootstrap = None
+        if data.get("bootstrap"):
+            bootstrap = start_books_page(repository, email, 1, 10, "created_at", "desc", include_stats=True)
+        
+        response = issue_tokens(email)
+        if bootstrap:
+            response["bootstrap"] = bootstrap()
+        return jsonify(response), 200
     except Exception as e:
-        return jsonify({"message": f"Login error: {str(e)}"}), 500
+        return jsonify({"message": f"Login error: {str(e)}"}), error_status(e)
 
 
 ### ✅ Protected Route (Only Authenticated Users)
@@ -114,11 +148,27 @@ def profile():
 @app.route("/logout", methods=["POST"])
 @jwt_required()
 def logout():
-    jti = get_jwt()["jti"]
-    jwt_blocklist.add(jti)
+    jwt_payload = get_jwt()
+    revoke_access_token(jwt_payload)
+    # End the refresh token family of this login as well
+    if "rf" in jwt_payload:
+        revoke_family(jwt_payload["rf"])
     return jsonify({"message": "Logout successful!"}), 200
 
 
+### ✅ Token Refresh Route (Rotates the refresh token)
+@app.route("/refresh", methods=["POST"])
+@jwt_required(refresh=True)
+def refresh():
+    try:
+        tokens = rotate_tokens(get_jwt())
+        if tokens is None:
+            return jsonify({"message": "Refresh token has been revoked"}), 401
+        return jsonify(tokens), 200
+    except Exception as e:
+        return jsonify({"message": f"Token refresh error: {str(e)}"}), error_status(e)
+
+
 ### ✅ CRUD Operations (Books)
 
 # 📌 Add a New Book (Authenticated Users Only)
@@ -156,13 +206,17 @@ def add_book():
             "created_at": datetime.now(timezone.utc)
         }
 
-        result = books_collection.insert_one(book)
+        if write_batcher:
+            book_id = write_batcher.add_book(book, timeout=remaining_seconds())
+        else:
+            book_id = repository.add_book(book)
+        book_changed(current_user, "add", book_id)
         return jsonify({
             "message": "Book added successfully!",
-            "book_id": str(result.inserted_id)
+            "book_id": book_id
         }), 201
     except Exception as e:
-        return jsonify({"message": f"Error adding book: {str(e)}"}), 500
+        return jsonify({"message": f"Error adding book: {str(e)}"}), error_status(e)
 
 
 # 📌 Get All Books (Only for Logged-in User)
@@ -179,26 +233,22 @@ def get_books():
         # Limit per_page to prevent performance issues
         if per_page > 50:
             per_page = 50
-            
-        skip = (page - 1) * per_page
         
-        # Get total count for pagination info
-        total_books = books_collection.count_documents({"user": current_user})
+        # Sorting is done by the database using the per-user compound indexes
+        sort = request.args.get('sort', 'created_at')
+        order = request.args.get('order', 'asc')
+        if sort not in SORT_FIELDS:
+            return jsonify({"message": f"Invalid sort field. Use one of: {', '.join(SORT_FIELDS)}"}), 400
+        if order not in ("asc", "desc"):
+            return jsonify({"message": "Order must be 'asc' or 'desc'"}), 400
         
-        # Convert ObjectId to string for JSON serialization
-        books = list(books_collection.find({"user": current_user}).skip(skip).limit(per_page))
-        for book in books:
-            book["_id"] = str(book["_id"])
-            
-        return jsonify({
-            "books": books,
-            "page": page,
-            "per_page": per_page,
-            "total": total_books,
-            "pages": (total_books + per_page - 1) // per_page
-        })
+        # Total count (for pagination), the page itself and, when asked for,
+        # read/unread totals are queried concurrently
+        include_stats = request.args.get('include_stats', 'false').lower() == 'true'
+        books_page = start_books_page(repository, current_user, page, per_page, sort, order, include_stats)
+        return jsonify(books_page())
     except Exception as e:
-        return jsonify({"message": f"Error retrieving books: {str(e)}"}), 500
+        return jsonify({"message": f"Error retrieving books: {str(e)}"}), error_status(e)
 
 
 # 📌 Get a Book by ID (Only if it belongs to the logged-in user)
@@ -212,16 +262,14 @@ def get_book_by_id(book_id):
         if not ObjectId.is_valid(book_id):
             return jsonify({"message": "Invalid book ID format"}), 400
             
-        book = books_collection.find_one({"_id": ObjectId(book_id), "user": current_user})
+        book = repository.get_book(current_user, book_id)
         
         if book:
-            # Convert ObjectId to string for JSON serialization
-            book["_id"] = str(book["_id"])
             return jsonify(book)
         else:
             return jsonify({"message": "Book not found or access denied!"}), 404
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return jsonify({"error": str(e)}), error_status(e)
 
 
 # 📌 Update a Book (Only if it belongs to the logged-in user)
@@ -240,7 +288,7 @@ def update_book(book_id):
             return jsonify({"message": "Invalid book ID format"}), 400
             
         # Check if book exists and belongs to user
-        existing_book = books_collection.find_one({"_id": ObjectId(book_id), "user": current_user})
+        existing_book = repository.get_book(current_user, book_id)
         if not existing_book:
             return jsonify({"message": "Book not found or access denied"}), 404
             
@@ -265,17 +313,15 @@ def update_book(book_id):
                 
         update_data["updated_at"] = datetime.now(timezone.utc)
 
-        result = books_collection.update_one(
-            {"_id": ObjectId(book_id), "user": current_user},
-            {"$set": update_data}
-        )
+        modified = repository.update_book(current_user, book_id, update_data)
         
-        if result.modified_count > 0:
+        if modified:
+            book_changed(current_user, "update", book_id)
             return jsonify({"message": "Book updated successfully!"})
         else:
             return jsonify({"message": "No changes made to the book"}), 200
     except Exception as e:
-        return jsonify({"message": f"Error updating book: {str(e)}"}), 500
+        return jsonify({"message": f"Error updating book: {str(e)}"}), error_status(e)
 
 
 # 📌 Delete a Book (Only if it belongs to the logged-in user)
@@ -290,19 +336,212 @@ def delete_book(book_id):
             return jsonify({"message": "Invalid book ID format"}), 400
             
         # Check if book exists and belongs to user before deleting
-        existing_book = books_collection.find_one({"_id": ObjectId(book_id), "user": current_user})
+        existing_book = repository.get_book(current_user, book_id)
         if not existing_book:
             return jsonify({"message": "Book not found or access denied"}), 404
             
-        result = books_collection.delete_one({"_id": ObjectId(book_id), "user": current_user})
+        deleted = repository.delete_book(current_user, book_id)
         
-        if result.deleted_count > 0:
+        if deleted:
+            if existing_book.get("cover"):
+                repository.delete_cover(existing_book["cover"]["id"])
+            book_changed(current_user, "delete", book_id)
             return jsonify({"message": "Book deleted successfully!"})
         else:
             return jsonify({"message": "Book not found or access denied!"}), 404
             
     except Exception as e:
-        return jsonify({"message": f"Error deleting book: {str(e)}"}), 500
+        return jsonify({"message": f"Error deleting book: {str(e)}"}), error_status(e)
+
+
+### ✅ Book Covers (Images in GridFS, only a reference on the book)
+
+# 📌 Upload or replace a book cover
+@app.route("/book/<book_id>/cover", methods=["POST"])
+@jwt_required()
+def upload_cover(book_id):
+    try:
+        current_user = get_jwt_identity()
+        
+        # Validate ObjectId format
+        if not ObjectId.is_valid(book_id):
+            return jsonify({"message": "Invalid book ID format"}), 400
+            
+        existing_book = repository.get_book(current_user, book_id)
+        if not existing_book:
+            return jsonify({"message": "Book not found or access denied"}), 404
+        
+        image = request.files.get("cover")
+        if not image:
+            return jsonify({"message": "No cover image provided"}), 400
+        
+        image.stream.seek(0, os.SEEK_END)
+        length = image.stream.tell()
+        image.stream.seek(0)
+        if length > COVER_MAX_BYTES:
+            return jsonify({"message": f"Cover must be at most {COVER_MAX_BYTES // (1024 * 1024)} MB"}), 400
+        
+        # The type comes from the image itself, not the client-declared mimetype
+        try:
+            content_type = cover_content_type(image.stream)
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+        
+        cover_id = repository.save_cover(current_user, book_id, image.stream, content_type)
+        cover = cover_reference(cover_id, content_type, length)
+        repository.update_book(current_user, book_id, {"cover": cover, "updated_at": datetime.now(timezone.utc)})
+        
+        # Replaced covers are removed once the book points at the new one
+        if existing_book.get("cover"):
+            repository.delete_cover(existing_book["cover"]["id"])
+        
+        book_changed(current_user, "update", book_id)
+        return jsonify({"message": "Cover uploaded successfully!", "cover": cover}), 201
+    except Exception as e:
+        return jsonify({"message": f"Error uploading cover: {str(e)}"}), error_status(e)
+
+
+# 📌 Download a book cover (supports Range and If-None-Match)
+@app.route("/book/<book_id>/cover", methods=["GET"])
+@jwt_required()
+def download_cover(book_id):
+    try:
+        current_user = get_jwt_identity()
+        
+        # Validate ObjectId format
+        if not ObjectId.is_valid(book_id):
+            return jsonify({"message": "Invalid book ID format"}), 400
+            
+        book = repository.get_book(current_user, book_id)
+        if not book or not book.get("cover"):
+            return jsonify({"message": "Cover not found or access denied"}), 404
+        
+        file = repository.open_cover(book["cover"]["id"])
+        if file is None:
+            return jsonify({"message": "Cover not found or access denied"}), 404
+        return cover_response(file, book["cover"])
+    except Exception as e:
+        return jsonify({"message": f"Error retrieving cover: {str(e)}"}), error_status(e)
+
+
+# 📌 Cover thumbnail, generated once and cached on disk
+@app.route("/book/<book_id>/cover/thumbnail", methods=["GET"])
+@jwt_required()
+def cover_thumbnail(book_id):
+    try:
+        current_user = get_jwt_identity()
+        
+        # Validate ObjectId format
+        if not ObjectId.is_valid(book_id):
+            return jsonify({"message": "Invalid book ID format"}), 400
+        
+        size = request.args.get('size', 128, type=int)
+        if size not in THUMBNAIL_SIZES:
+            return jsonify({"message": f"Size must be one of: {', '.join(map(str, sorted(THUMBNAIL_SIZES)))}"}), 400
+            
+        book = repository.get_book(current_user, book_id)
+        if not book or not book.get("cover"):
+            return jsonify({"message": "Cover not found or access denied"}), 404
+        
+        etag = f"{book['cover']['id']}-{size}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            thumbnail = get_thumbnail(repository, book["cover"]["id"], size)
+            if thumbnail is None:
+                return jsonify({"message": "Cover not found or access denied"}), 404
+            response = Response(thumbnail, mimetype="image/jpeg")
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = cover_cache_control(book["cover"]["id"])
+        return response
+    except Exception as e:
+        return jsonify({"message": f"Error retrieving thumbnail: {str(e)}"}), error_status(e)
+
+
+# 📌 Remove a book cover
+@app.route("/book/<book_id>/cover", methods=["DELETE"])
+@jwt_required()
+def delete_cover(book_id):
+    try:
+        current_user = get_jwt_identity()
+        
+        # Validate ObjectId format
+        if not ObjectId.is_valid(book_id):
+            return jsonify({"message": "Invalid book ID format"}), 400
+            
+        book = repository.get_book(current_user, book_id)
+        if not book or not book.get("cover"):
+            return jsonify({"message": "Cover not found or access denied"}), 404
+        
+        repository.update_book(current_user, book_id, {"cover": None, "updated_at": datetime.now(timezone.utc)})
+        repository.delete_cover(book["cover"]["id"])
+        book_changed(current_user, "update", book_id)
+        return jsonify({"message": "Cover removed successfully!"})
+    except Exception as e:
+        return jsonify({"message": f"Error removing cover: {str(e)}"}), error_status(e)
+
+
+### ✅ Library Change Events (Server-Sent Events)
+@app.route("/events", methods=["GET"])
+@jwt_required()
+def events():
+    current_user = get_jwt_identity()
+    # Streams are capped so they cannot take every worker thread; clients poll meanwhile
+    if not acquire_stream():
+        response = jsonify({"message": "Too many open event streams. Please try again later."})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(SSE_BUSY_RETRY_SECONDS)
+        return response
+    
+    response = Response(
+        stream_with_context(stream_events(current_user)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    response.call_on_close(release_stream)
+    return response
+
+
+### ✅ Admin Routes
+
+# 📌 Slowest query shapes recorded by the slow-query log (admins only)
+@app.route("/admin/slow_queries", methods=["GET"])
+@jwt_required()
+def slow_queries():
+    try:
+        if not is_admin(get_jwt_identity()):
+            return jsonify({"message": "Admin access required"}), 403
+        if STORAGE_ENGINE != "mongo":
+            return jsonify({"message": "Slow query log requires MongoDB storage"}), 404
+        
+        # Imported on demand: pymongo is only needed here with MongoDB storage
+        from database import db
+        from slow_queries import top_slow_queries
+        
+        limit = min(request.args.get('limit', 20, type=int), 100)
+        sort_by = request.args.get('sort', 'total_ms')
+        if sort_by not in ("total_ms", "max_ms", "count"):
+            return jsonify({"message": "Invalid sort field"}), 400
+        
+        offenders = top_slow_queries(db, limit, sort_by)
+        for offender in offenders:
+            offender["first_seen"] = offender["first_seen"].isoformat()
+            offender["last_seen"] = offender["last_seen"].isoformat()
+        return jsonify({"slow_queries": offenders})
+    except Exception as e:
+        return jsonify({"message": f"Error retrieving slow queries: {str(e)}"}), error_status(e)
+
+
+
+# 📌 Batch size metrics for coalesced add_book writes (admins only)
+@app.route("/admin/write_batches", methods=["GET"])
+@jwt_required()
+def write_batches():
+    if not is_admin(get_jwt_identity()):
+        return jsonify({"message": "Admin access required"}), 403
+    if not write_batcher:
+        return jsonify({"message": "Write coalescing is disabled"}), 404
+    return jsonify(write_batcher.stats())
 
 
 if __name__ == "__main__":
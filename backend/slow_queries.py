@@ -0,0 +1,194 @@
+import argparse
+import hashlib
+import json
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from pymongo import monitoring
+
+# Load environment variables
+load_dotenv()
+
+SLOW_QUERY_LOG_ENABLED = os.getenv("SLOW_QUERY_LOG_ENABLED", "True").lower() == "true"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 100))
+SLOW_QUERIES_COLLECTION = "slow_queries"
+
+# Commands worth explaining, and where each keeps its query shape
+MONITORED_COMMANDS = {
+    "find": lambda cmd: {"filter": cmd.get("filter", {}), "sort": cmd.get("sort", {})},
+    "count": lambda cmd: {"query": cmd.get("query", {})},
+    "aggregate": lambda cmd: {"pipeline": cmd.get("pipeline", [])},
+    "distinct": lambda cmd: {"key": cmd.get("key"), "query": cmd.get("query", {})},
+    "findAndModify": lambda cmd: {"query": cmd.get("query", {}), "sort": cmd.get("sort", {})},
+    "update": lambda cmd: {"q": (cmd.get("updates") or [{}])[0].get("q", {})},
+    "delete": lambda cmd: {"q": (cmd.get("deletes") or [{}])[0].get("q", {})},
+}
+# Session and cluster fields the driver adds; explain adds its own
+DRIVER_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction", "apiVersion", "apiStrict", "apiDeprecationErrors"}
+
+
+# 📌 Replace literal values with type names so queries differing only in values share a shape
+def normalize(value):
+    if isinstance(value, dict):
+        return {key: normalize(value[key]) for key in sorted(value)}
+    if isinstance(value, list):
+        if value and all(isinstance(item, dict) for item in value):
+            return [normalize(item) for item in value]
+        return "[?]"
+    if value is None:
+        return None
+    return f"<{type(value).__name__}>"
+
+
+def shape_of(command_name, collection, command):
+    shape = json.dumps(
+        {"ns": collection, "op": command_name, "shape": normalize(MONITORED_COMMANDS[command_name](command))},
+        sort_keys=True
+    )
+    return hashlib.sha1(shape.encode("utf-8")).hexdigest(), shape
+
+
+def plan_stages(query_planner):
+    # Flatten the winning plan into its stage names, e.g. ["FETCH", "IXSCAN"]
+    plan = query_planner.get("winningPlan", {})
+    plan = plan.get("queryPlan", plan)
+    stages = []
+    pending = [plan]
+    while pending:
+        node = pending.pop(0)
+        if "stage" in node:
+            stages.append(node["stage"])
+        if "inputStage" in node:
+            pending.append(node["inputStage"])
+        pending.extend(node.get("inputStages", []))
+    return stages
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    def __init__(self, threshold_ms):
+        self.threshold_micros = threshold_ms * 1000
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.queue = queue.Queue(maxsize=1000)
+        self.explained = set()
+        self.worker = None
+
+    # Listener callbacks run inline with every command, so they only record and hand off
+    def started(self, event):
+        if event.command_name not in MONITORED_COMMANDS:
+            return
+        collection = event.command.get(event.command_name)
+        if collection == SLOW_QUERIES_COLLECTION:
+            return
+        with self.lock:
+            self.pending[(event.request_id, event.connection_id)] = (event.database_name, event.command)
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        self._finished(event)
+
+    def _finished(self, event):
+        with self.lock:
+            started = self.pending.pop((event.request_id, event.connection_id), None)
+        if started is None or event.duration_micros < self.threshold_micros:
+            return
+        self._start_worker()
+        try:
+            self.queue.put_nowait((event.command_name, started[0], started[1], event.duration_micros / 1000))
+        except queue.Full:
+            pass
+
+    def _start_worker(self):
+        if self.worker is None or not self.worker.is_alive():
+            with self.lock:
+                if self.worker is None or not self.worker.is_alive():
+                    self.worker = threading.Thread(target=self._run, name="slow-query-recorder", daemon=True)
+                    self.worker.start()
+
+    def _run(self):
+        # Imported here because database.py installs this listener
+        from database import client
+
+        while True:
+            command_name, database_name, command, duration_ms = self.queue.get()
+            try:
+                self._record(client[database_name], command_name, command, duration_ms)
+            except Exception as e:
+                print(f"Failed to record slow query: {str(e)}")
+
+    def _record(self, db, command_name, command, duration_ms):
+        collection = command.get(command_name)
+        shape_id, shape = shape_of(command_name, collection, command)
+        slow_queries = db[SLOW_QUERIES_COLLECTION]
+        now = datetime.now(timezone.utc)
+
+        update = {
+            "$inc": {"count": 1, "total_ms": duration_ms},
+            "$max": {"max_ms": duration_ms},
+            "$set": {"last_seen": now},
+            "$setOnInsert": {"ns": f"{db.name}.{collection}", "command": command_name, "shape": shape, "first_seen": now},
+        }
+
+        # Explain each shape once, not once per slow execution
+        if shape_id not in self.explained:
+            if not slow_queries.find_one({"_id": shape_id, "explain": {"$exists": True}}, {"_id": 1}):
+                explain_command = {
+                    key: value for key, value in command.items()
+                    if not key.startswith("$") and key not in DRIVER_FIELDS
+                }
+                try:
+                    explain = db.command({"explain": explain_command, "verbosity": "queryPlanner"})
+                    query_planner = explain.get("queryPlanner") or explain.get("stages", [{}])[0].get("$cursor", {}).get("queryPlanner", {})
+                    update["$set"]["explain"] = query_planner
+                    update["$set"]["plan_stages"] = plan_stages(query_planner)
+                except Exception as e:
+                    print(f"Failed to explain slow {command_name} on {collection}: {str(e)}")
+            self.explained.add(shape_id)
+
+        slow_queries.update_one({"_id": shape_id}, update, upsert=True)
+
+
+slow_query_listener = SlowQueryListener(SLOW_QUERY_MS)
+
+
+def event_listeners():
+    return [slow_query_listener] if SLOW_QUERY_LOG_ENABLED else []
+
+
+def top_slow_queries(db, limit=20, sort_by="total_ms"):
+    offenders = list(
+        db[SLOW_QUERIES_COLLECTION].find({}, {"explain": 0}).sort(sort_by, -1).limit(limit)
+    )
+    for offender in offenders:
+        offender["avg_ms"] = offender["total_ms"] / offender["count"]
+        offender["scans_collection"] = "COLLSCAN" in offender.get("plan_stages", [])
+    return offenders
+
+
+# 📌 CLI report: python slow_queries.py [--limit N] [--sort total_ms|max_ms|count]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report the slowest MongoDB query shapes")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--sort", choices=["total_ms", "max_ms", "count"], default="total_ms")
+    parser.add_argument("--explain", action="store_true", help="Print the stored query plan for each shape")
+    args = parser.parse_args()
+
+    from database import db
+
+    offenders = top_slow_queries(db, args.limit, args.sort)
+    if not offenders:
+        print("No slow queries recorded.")
+    for offender in offenders:
+        print(
+            f"{offender['count']:>7}x  total {offender['total_ms']:>10.1f}ms  "
+            f"avg {offender['avg_ms']:>8.1f}ms  max {offender['max_ms']:>8.1f}ms  "
+            f"{offender['ns']} {offender['command']}  plan: {' > '.join(offender.get('plan_stages', [])) or 'n/a'}"
+        )
+        print(f"         {offender['shape']}")
+        if args.explain:
+            stored = db[SLOW_QUERIES_COLLECTION].find_one({"_id": offender["_id"]}, {"explain": 1})
+            print(json.dumps(stored.get("explain", {}), indent=2, default=str))
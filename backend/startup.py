@@ -0,0 +1,87 @@
+import builtins
+import os
+import sys
+import threading
+import time
+
+# Startup timing report (STARTUP_REPORT=true): import time per top-level module
+# and time from process start to the first request, printed once per process.
+# Import this module first so the import timer sees everything after it.
+
+STARTUP_REPORT = os.getenv("STARTUP_REPORT", "False").lower() == "true"
+STARTUP_REPORT_TOP = int(os.getenv("STARTUP_REPORT_TOP", 15))
+
+PROCESS_START = time.perf_counter()
+import_times = {}  # top-level module -> seconds spent on its own first import
+
+_original_import = builtins.__import__
+_local = threading.local()
+_report_lock = threading.Lock()
+_reported = False
+_app_ready_at = None
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    top_level = name.partition(".")[0]
+    stack = _local.__dict__.setdefault("stack", [])
+    if stack and stack[-1][0] == top_level:
+        # A package importing its own submodules is part of its own time
+        return _original_import(name, globals, locals, fromlist, level)
+
+    # Each entry is [module, time spent importing other modules inside it],
+    # so every module is charged only for its own work
+    entry = [top_level, 0.0]
+    stack.append(entry)
+    started = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - started
+        stack.pop()
+        import_times[top_level] = import_times.get(top_level, 0) + elapsed - entry[1]
+        if stack:
+            stack[-1][1] += elapsed
+
+
+if STARTUP_REPORT:
+    builtins.__import__ = _timed_import
+
+
+def mark_app_ready():
+    global _app_ready_at
+    _app_ready_at = time.perf_counter()
+
+
+def report():
+    lines = [f"Startup report (pid {os.getpid()})"]
+    if _app_ready_at is not None:
+        lines.append(f"  app ready:           {(_app_ready_at - PROCESS_START) * 1000:8.1f}ms")
+    lines.append(f"  first request after: {(time.perf_counter() - PROCESS_START) * 1000:8.1f}ms")
+    lines.append("  slowest imports:")
+    slowest = sorted(import_times.items(), key=lambda item: item[1], reverse=True)[:STARTUP_REPORT_TOP]
+    for module, seconds in slowest:
+        lines.append(f"    {module:<24} {seconds * 1000:8.1f}ms")
+    print("\n".join(lines), flush=True)
+
+
+# 📌 Print the report when the first request arrives, then stop timing imports.
+# Register before the other request hooks so it sees the request first.
+def init_startup_report(app):
+    if not STARTUP_REPORT:
+        return
+
+    @app.before_request
+    def first_request_report():
+        global _reported
+        if _reported:
+            return None
+        with _report_lock:
+            if _reported:
+                return None
+            _reported = True
+            builtins.__import__ = _original_import
+            report()
+        return None
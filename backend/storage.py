@@ -0,0 +1,361 @@
+import argparse
+import contextlib
+import io
+import itertools
+import os
+import threading
+from datetime import datetime, timezone
+from bson import ObjectId
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# "mongo" (default) or "memory" for single-node deployments and tests
+STORAGE_ENGINE = os.getenv("STORAGE_ENGINE", "mongo").lower()
+
+# Fields /books can be sorted by; _id breaks ties so pages never overlap
+SORT_FIELDS = ["created_at", "title", "author", "year", "read"]
+# Text fields sort by locale rules ("apple" before "Banana"), not byte order.
+# Default strength keeps equality on "user" exact.
+TEXT_COLLATION = {"locale": "en"}
+TEXT_SORT_FIELDS = {"title", "author"}
+
+
+# 📌 MongoDB storage (the production engine)
+class MongoRepository:
+    def __init__(self):
+        # Imported here so the in-memory engine never opens a MongoDB client
+        from database import books_collection, users_collection, refresh_tokens_collection, revoked_tokens_collection
+
+        self.books = books_collection
+        self.users = users_collection
+        self.refresh_tokens = refresh_tokens_collection
+        self.revoked_tokens = revoked_tokens_collection
+        self._covers = None
+
+    # Every operation inside the block gets maxTimeMS and socket timeouts
+    # from the remaining time (client-side operation timeout)
+    def deadline(self, seconds):
+        import pymongo
+        return pymongo.timeout(seconds)
+
+    def _index_specs(self):
+        # One compound index per sort field, led by user, so every page is an
+        # index walk of exactly skip + limit entries with no in-memory sort
+        for field in SORT_FIELDS:
+            direction = -1 if field == "created_at" else 1
+            options = {"collation": TEXT_COLLATION} if field in TEXT_SORT_FIELDS else {}
+            yield self.books, f"user_{field}", [("user", 1), (field, direction), ("_id", direction)], options
+        # Expired tokens are removed by MongoDB's TTL monitor
+        yield self.refresh_tokens, "expires_at_1", [("expires_at", 1)], {"expireAfterSeconds": 0}
+        yield self.refresh_tokens, "family_1", [("family", 1)], {}
+        yield self.revoked_tokens, "expires_at_1", [("expires_at", 1)], {"expireAfterSeconds": 0}
+
+    # 📌 Build missing indexes; run outside any request deadline (see the CLI below),
+    # since a build on a large collection can take far longer than a request
+    def ensure_indexes(self):
+        created = []
+        for collection, name, keys, options in self._index_specs():
+            if name not in collection.index_information():
+                collection.create_index(keys, name=name, **options)
+                created.append(f"{collection.name}.{name}")
+        return created
+
+    # Users
+    def find_user(self, email):
+        return self.users.find_one({"email": email})
+
+    def create_user(self, user):
+        self.users.insert_one(user)
+
+    # Books
+    def add_book(self, book):
+        return str(self.books.insert_one(book).inserted_id)
+
+    # Returns one id per book, or the exception for a book that failed to insert
+    def add_books(self, books):
+        from pymongo.errors import BulkWriteError
+
+        failed = {}
+        try:
+            self.books.insert_many(books, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"]: error["errmsg"] for error in e.details["writeErrors"]}
+        return [
+            RuntimeError(failed[i]) if i in failed else str(book["_id"])
+            for i, book in enumerate(books)
+        ]
+
+    def count_books(self, user):
+        return self.books.count_documents({"user": user})
+
+    def count_read_books(self, user):
+        # Served from the {user, read} sort index
+        return self.books.count_documents({"user": user, "read": True})
+
+    def list_books(self, user, skip, limit, sort="created_at", order="asc"):
+        direction = 1 if order == "asc" else -1
+        cursor = self.books.find({"user": user}).sort([(sort, direction), ("_id", direction)])
+        if sort in TEXT_SORT_FIELDS:
+            # Must match the index collation for the index to be used
+            cursor = cursor.collation(TEXT_COLLATION)
+        books = list(cursor.skip(skip).limit(limit))
+        for book in books:
+            book["_id"] = str(book["_id"])
+        return books
+
+    def get_book(self, user, book_id):
+        book = self.books.find_one({"_id": ObjectId(book_id), "user": user})
+        if book:
+            book["_id"] = str(book["_id"])
+        return book
+
+    def update_book(self, user, book_id, fields):
+        result = self.books.update_one({"_id": ObjectId(book_id), "user": user}, {"$set": fields})
+        return result.modified_count > 0
+
+    def delete_book(self, user, book_id):
+        result = self.books.delete_one({"_id": ObjectId(book_id), "user": user})
+        return result.deleted_count > 0
+
+    # Cover images (GridFS keeps them out of the books documents)
+    def _cover_bucket(self):
+        if self._covers is None:
+            import gridfs
+            self._covers = gridfs.GridFSBucket(self.books.database, bucket_name="covers")
+        return self._covers
+
+    def save_cover(self, user, book_id, data, content_type):
+        cover_id = self._cover_bucket().upload_from_stream(
+            f"{book_id}",
+            data,
+            metadata={"user": user, "book_id": book_id, "content_type": content_type}
+        )
+        return str(cover_id)
+
+    # Returns a seekable file object with .length, or None
+    def open_cover(self, cover_id):
+        import gridfs
+        try:
+            return self._cover_bucket().open_download_stream(ObjectId(cover_id))
+        except gridfs.errors.NoFile:
+            return None
+
+    def delete_cover(self, cover_id):
+        import gridfs
+        try:
+            self._cover_bucket().delete(ObjectId(cover_id))
+        except gridfs.errors.NoFile:
+            pass
+
+    # Refresh tokens
+    def save_refresh_token(self, token):
+        self.refresh_tokens.insert_one(token)
+
+    def get_refresh_token(self, jti):
+        return self.refresh_tokens.find_one({"_id": jti})
+
+    def spend_refresh_token(self, jti, fields):
+        return self.refresh_tokens.find_one_and_update({"_id": jti, "revoked": False}, {"$set": fields})
+
+    def revoke_refresh_tokens(self, family, fields):
+        self.refresh_tokens.update_many({"family": family, "revoked": False}, {"$set": fields})
+
+    # Revoked access tokens, kept until they would have expired anyway
+    def revoke_access_token(self, jti, expires_at):
+        self.revoked_tokens.update_one({"_id": jti}, {"$setOnInsert": {"expires_at": expires_at}}, upsert=True)
+
+    def is_access_token_revoked(self, jti):
+        return self.revoked_tokens.find_one({"_id": jti}, {"_id": 1}) is not None
+
+
+# 📌 In-process storage with per-user indexes (data is lost on restart)
+class MemoryRepository:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.users = {}  # email -> user
+        self.books = {}  # book id -> book
+        self.books_by_user = {}  # email -> {book id: book}, in insertion order
+        self.refresh_tokens = {}  # jti -> token
+        self.refresh_families = {}  # family -> set of jti
+        self.revoked_access_tokens = {}  # jti -> expires_at
+        self.covers = {}  # cover id -> image bytes
+
+    # In-process operations cannot block on I/O, so there is nothing to bound
+    def deadline(self, seconds):
+        return contextlib.nullcontext()
+
+    # Lookups already go through the dicts below
+    def ensure_indexes(self):
+        return []
+
+    # Users
+    def find_user(self, email):
+        with self.lock:
+            user = self.users.get(email)
+            return dict(user) if user else None
+
+    def create_user(self, user):
+        with self.lock:
+            user = dict(user, _id=str(ObjectId()))
+            self.users[user["email"]] = user
+
+    # Books
+    def add_book(self, book):
+        with self.lock:
+            book = dict(book, _id=str(ObjectId()))
+            self.books[book["_id"]] = book
+            self.books_by_user.setdefault(book["user"], {})[book["_id"]] = book
+            return book["_id"]
+
+    def add_books(self, books):
+        return [self.add_book(book) for book in books]
+
+    def count_books(self, user):
+        with self.lock:
+            return len(self.books_by_user.get(user, ()))
+
+    def count_read_books(self, user):
+        with self.lock:
+            return sum(1 for book in self.books_by_user.get(user, {}).values() if book.get("read") is True)
+
+    def list_books(self, user, skip, limit, sort="created_at", order="asc"):
+        def sort_key(book):
+            value = book.get(sort)
+            if sort in TEXT_SORT_FIELDS and isinstance(value, str):
+                value = value.casefold()
+            # Missing values sort first, as in MongoDB
+            return (value is not None, value if value is not None else 0, book["_id"])
+
+        with self.lock:
+            books = self.books_by_user.get(user, {}).values()
+            if sort == "created_at" and order == "asc":
+                # Insertion order already is creation order
+                page = itertools.islice(books, skip, skip + limit)
+            else:
+                page = sorted(books, key=sort_key, reverse=order == "desc")[skip:skip + limit]
+            return [dict(book) for book in page]
+
+    def get_book(self, user, book_id):
+        with self.lock:
+            book = self.books_by_user.get(user, {}).get(book_id)
+            return dict(book) if book else None
+
+    def update_book(self, user, book_id, fields):
+        with self.lock:
+            book = self.books_by_user.get(user, {}).get(book_id)
+            if book is None:
+                return False
+            # Like MongoDB's modified_count: any field that changes value counts,
+            # updated_at included, which the routes always set
+            changed = any(book.get(field) != value for field, value in fields.items())
+            book.update(fields)
+            return changed
+
+    def delete_book(self, user, book_id):
+        with self.lock:
+            book = self.books_by_user.get(user, {}).pop(book_id, None)
+            if book is None:
+                return False
+            del self.books[book_id]
+            return True
+
+    # Cover images
+    def save_cover(self, user, book_id, data, content_type):
+        with self.lock:
+            cover_id = str(ObjectId())
+            self.covers[cover_id] = data.read()
+            return cover_id
+
+    def open_cover(self, cover_id):
+        with self.lock:
+            data = self.covers.get(cover_id)
+        if data is None:
+            return None
+        cover = io.BytesIO(data)
+        cover.length = len(data)
+        return cover
+
+    def delete_cover(self, cover_id):
+        with self.lock:
+            self.covers.pop(cover_id, None)
+
+    # Refresh tokens
+    def save_refresh_token(self, token):
+        with self.lock:
+            self._expire_refresh_tokens()
+            self.refresh_tokens[token["_id"]] = dict(token)
+            self.refresh_families.setdefault(token["family"], set()).add(token["_id"])
+
+    def get_refresh_token(self, jti):
+        with self.lock:
+            token = self.refresh_tokens.get(jti)
+            return dict(token) if token else None
+
+    def spend_refresh_token(self, jti, fields):
+        with self.lock:
+            token = self.refresh_tokens.get(jti)
+            if token is None or token["revoked"]:
+                return None
+            spent = dict(token)
+            token.update(fields)
+            return spent
+
+    def revoke_refresh_tokens(self, family, fields):
+        with self.lock:
+            for jti in self.refresh_families.get(family, ()):
+                token = self.refresh_tokens[jti]
+                if not token["revoked"]:
+                    token.update(fields)
+
+    def revoke_access_token(self, jti, expires_at):
+        with self.lock:
+            now = datetime.now(timezone.utc)
+            self.revoked_access_tokens = {
+                revoked: expiry for revoked, expiry in self.revoked_access_tokens.items() if expiry > now
+            }
+            self.revoked_access_tokens[jti] = expires_at
+
+    def is_access_token_revoked(self, jti):
+        with self.lock:
+            return jti in self.revoked_access_tokens
+
+    def _expire_refresh_tokens(self):
+        now = datetime.now(timezone.utc)
+        for jti in [jti for jti, token in self.refresh_tokens.items() if token["expires_at"] <= now]:
+            token = self.refresh_tokens.pop(jti)
+            family = self.refresh_families[token["family"]]
+            family.discard(jti)
+            if not family:
+                del self.refresh_families[token["family"]]
+
+
+ENGINES = {
+    "mongo": MongoRepository,
+    "memory": MemoryRepository,
+}
+
+_repository = None
+_repository_lock = threading.Lock()
+
+
+def get_repository():
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                if STORAGE_ENGINE not in ENGINES:
+                    raise ValueError(f"Unknown STORAGE_ENGINE '{STORAGE_ENGINE}', expected one of: {', '.join(ENGINES)}")
+                _repository = ENGINES[STORAGE_ENGINE]()
+    return _repository
+
+
+# 📌 CLI: python storage.py ensure-indexes (run by the start command before gunicorn)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prepare the configured storage engine")
+    parser.add_argument("command", choices=["ensure-indexes"])
+    args = parser.parse_args()
+
+    created = get_repository().ensure_indexes()
+    print(f"Created indexes: {', '.join(created)}" if created else "All indexes already exist.")
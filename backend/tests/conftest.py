@@ -0,0 +1,58 @@
+import os
+import sys
+import tempfile
+import uuid
+import pytest
+
+# Run with: python -m pytest backend/tests
+# Everything runs against the in-memory storage engine, so no MongoDB is needed.
+# Settings are read at import time, so they are set before the app is imported.
+os.environ["STORAGE_ENGINE"] = "memory"
+os.environ["JWT_SECRET_KEY"] = "test-secret-key-that-is-at-least-32-bytes"
+os.environ["RATE_LIMIT_ENABLED"] = "False"  # test_rate_limit.py builds its own app
+os.environ["WRITE_COALESCING"] = "False"
+os.environ["THUMBNAIL_CACHE_DIR"] = tempfile.mkdtemp(prefix="thumbnail_cache_")
+os.environ["PROFILE_SAMPLE_RATE"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routes import app as flask_app  # noqa: E402
+from tokens import issue_tokens  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def unique_email():
+    return f"user-{uuid.uuid4().hex[:12]}@example.com"
+
+
+# A fresh user with tokens issued directly, skipping bcrypt; books are keyed by email
+@pytest.fixture
+def user(app):
+    email = unique_email()
+    with app.app_context():
+        tokens = issue_tokens(email)
+    return {
+        "email": email,
+        "token": tokens["token"],
+        "refresh_token": tokens["refresh_token"],
+        "headers": {"Authorization": f"Bearer {tokens['token']}"},
+    }
+
+
+@pytest.fixture
+def add_book(client, user):
+    def add(**fields):
+        book = {"title": "Dune", "author": "Frank Herbert", "year": 1965, **fields}
+        response = client.post("/add_book", json=book, headers=user["headers"])
+        assert response.status_code == 201, response.json
+        return response.json["book_id"]
+    return add
@@ -0,0 +1,104 @@
+import io
+import pytest
+from PIL import Image
+from covers import MAX_REQUEST_BYTES
+
+
+def png_bytes(size=(200, 300)):
+    output = io.BytesIO()
+    Image.new("RGB", size, "red").save(output, format="PNG")
+    return output.getvalue()
+
+
+@pytest.fixture
+def cover_book(client, user, add_book):
+    book_id = add_book()
+    response = client.post(
+        f"/book/{book_id}/cover",
+        headers=user["headers"],
+        data={"cover": (io.BytesIO(png_bytes()), "cover.jpg", "image/jpeg")},
+    )
+    assert response.status_code == 201
+    return book_id, response.json["cover"]
+
+
+def test_cover_type_comes_from_the_image(cover_book):
+    _, cover = cover_book
+    assert cover["content_type"] == "image/png"
+
+
+@pytest.mark.parametrize("data", [b"not an image", png_bytes()[:-20]])
+def test_invalid_cover_is_rejected(client, user, add_book, data):
+    book_id = add_book()
+    response = client.post(
+        f"/book/{book_id}/cover",
+        headers=user["headers"],
+        data={"cover": (io.BytesIO(data), "cover.png", "image/png")},
+    )
+    assert response.status_code == 400
+
+
+def test_cover_ranges(client, user, cover_book):
+    book_id, cover = cover_book
+    url = f"/book/{book_id}/cover"
+
+    full = client.get(url, headers=user["headers"])
+    assert full.status_code == 200
+    assert full.data == png_bytes()
+    assert full.headers["Cache-Control"] == "private, no-cache"
+
+    versioned = client.get(f"{url}?v={cover['id']}", headers=user["headers"])
+    assert versioned.headers["Cache-Control"] == "private, max-age=31536000, immutable"
+
+    partial = client.get(url, headers={**user["headers"], "Range": "bytes=0-9"})
+    assert partial.status_code == 206
+    assert partial.data == full.data[:10]
+    assert partial.headers["Content-Range"] == f"bytes 0-9/{cover['length']}"
+
+    unsatisfiable = client.get(url, headers={**user["headers"], "Range": "bytes=99999-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["Content-Range"] == f"bytes */{cover['length']}"
+
+    cached = client.get(url, headers={**user["headers"], "If-None-Match": f'"{cover["id"]}"'})
+    assert cached.status_code == 304
+
+
+def test_cover_thumbnail(client, user, cover_book):
+    book_id, _ = cover_book
+    response = client.get(f"/book/{book_id}/cover/thumbnail?size=64", headers=user["headers"])
+    assert response.status_code == 200
+    with Image.open(io.BytesIO(response.data)) as thumbnail:
+        assert thumbnail.format == "JPEG"
+        assert max(thumbnail.size) == 64
+
+
+def test_replacing_a_cover_changes_its_etag(client, user, cover_book):
+    book_id, cover = cover_book
+    client.post(
+        f"/book/{book_id}/cover",
+        headers=user["headers"],
+        data={"cover": (io.BytesIO(png_bytes((80, 80))), "cover.png", "image/png")},
+    )
+    response = client.get(f"/book/{book_id}/cover", headers={**user["headers"], "If-None-Match": f'"{cover["id"]}"'})
+    assert response.status_code == 200
+
+
+def test_outdated_cover_url_is_revalidated(client, user, cover_book):
+    book_id, cover = cover_book
+    client.post(
+        f"/book/{book_id}/cover",
+        headers=user["headers"],
+        data={"cover": (io.BytesIO(png_bytes((80, 80))), "cover.png", "image/png")},
+    )
+    url = f"/book/{book_id}/cover/thumbnail?size=64&v={cover['id']}"
+    assert client.get(url, headers=user["headers"]).headers["Cache-Control"] == "private, no-cache"
+
+
+def test_oversized_upload_is_refused_before_reading(client, user, add_book):
+    book_id = add_book()
+    response = client.post(
+        f"/book/{book_id}/cover",
+        headers=user["headers"],
+        data={"cover": (io.BytesIO(b"0" * (MAX_REQUEST_BYTES + 1)), "cover.png", "image/png")},
+    )
+    assert response.status_code == 413
@@ -0,0 +1,28 @@
+import events
+
+
+def test_update_publishes_an_event(client, user, add_book):
+    book_id = add_book()
+    q = events.subscribe(user["email"])
+    try:
+        client.put(f"/update_book/{book_id}", json={"title": "Dune"}, headers=user["headers"])
+        event = q.get_nowait()
+        assert (event["type"], event["book_id"]) == ("update", book_id)
+    finally:
+        events.unsubscribe(user["email"], q)
+
+
+def test_event_streams_are_capped(client, user, monkeypatch):
+    monkeypatch.setattr(events, "SSE_MAX_STREAMS", 1)
+
+    stream = client.get("/events", headers=user["headers"], buffered=False)
+    assert stream.status_code == 200
+    busy = client.get("/events", headers=user["headers"])
+    assert busy.status_code == 503
+    assert "Retry-After" in busy.headers
+
+    # Closing the stream frees its slot
+    stream.close()
+    again = client.get("/events", headers=user["headers"], buffered=False)
+    assert again.status_code == 200
+    again.close()
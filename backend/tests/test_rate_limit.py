@@ -0,0 +1,81 @@
+import pytest
+import rate_limit
+from flask import Flask, jsonify
+from rate_limit import MemoryBucketStore, init_rate_limiting
+
+
+def test_bucket_allows_a_burst_then_refuses():
+    store = MemoryBucketStore()
+    results = [store.consume("key", capacity=3, refill_rate=0.001)[0] for _ in range(4)]
+    assert results == [True, True, True, False]
+
+    allowed, retry_after = store.consume("key", capacity=3, refill_rate=0.001)
+    assert not allowed and retry_after > 0
+
+
+def test_bucket_refills(monkeypatch):
+    store = MemoryBucketStore()
+    now = [100.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+
+    assert store.consume("key", capacity=1, refill_rate=1)[0] is True
+    assert store.consume("key", capacity=1, refill_rate=1)[0] is False
+    now[0] += 1
+    assert store.consume("key", capacity=1, refill_rate=1)[0] is True
+
+
+@pytest.fixture
+def limited_client(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit, "AUTH_RATE_LIMIT", "3/60")
+    monkeypatch.setattr(rate_limit, "AUTH_EMAIL_RATE_LIMIT", "5/60")
+
+    app = Flask(__name__)
+    init_rate_limiting(app)
+
+    @app.route("/login", methods=["POST"])
+    def login():
+        return jsonify({"message": "ok"})
+
+    return app.test_client()
+
+
+def login_statuses(client, count, email="victim@example.com", forwarded=None, remote_addr="10.0.0.1"):
+    statuses = []
+    for i in range(count):
+        headers = {"X-Forwarded-For": forwarded(i)} if forwarded else {}
+        response = client.post(
+            "/login",
+            json={"email": email, "password": "x"},
+            headers=headers,
+            environ_base={"REMOTE_ADDR": remote_addr},
+        )
+        statuses.append(response.status_code)
+    return statuses
+
+
+def test_spoofed_forwarded_for_is_ignored_by_default(limited_client):
+    statuses = login_statuses(limited_client, 5, forwarded=lambda i: f"203.0.113.{i}")
+    assert statuses == [200, 200, 200, 429, 429]
+
+
+def test_trusted_proxy_entry_is_used(limited_client, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_TRUSTED_PROXIES", 1)
+
+    # The client controls everything left of the entry the proxy appended
+    statuses = login_statuses(limited_client, 4, forwarded=lambda i: f"203.0.113.{i}, 198.51.100.7")
+    assert statuses == [200, 200, 200, 429]
+
+    other_client = login_statuses(limited_client, 1, email="other@example.com", forwarded=lambda i: "198.51.100.8")
+    assert other_client == [200]
+
+
+def test_one_ip_cannot_lock_out_an_account(limited_client):
+    login_statuses(limited_client, 10, remote_addr="10.0.0.1")
+    # The attacker's IP ran out, but the account still has budget left
+    assert login_statuses(limited_client, 1, remote_addr="10.0.0.2") == [200]
+
+
+def test_many_ips_share_the_account_budget(limited_client):
+    statuses = [login_statuses(limited_client, 1, remote_addr=f"10.0.1.{i}")[0] for i in range(6)]
+    assert statuses == [200] * 5 + [429]
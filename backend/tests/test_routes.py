@@ -0,0 +1,110 @@
+import pytest
+import routes
+from pymongo.errors import AutoReconnect, ExecutionTimeout, NetworkTimeout, ServerSelectionTimeoutError
+from conftest import unique_email
+from tokens import issue_tokens
+
+
+# Registration and login
+
+def test_register_and_login(client):
+    email = unique_email()
+    credentials = {"email": email, "password": "password123"}
+
+    assert client.post("/register", json=credentials).status_code == 201
+    assert client.post("/register", json=credentials).status_code == 400
+
+    response = client.post("/login", json=credentials)
+    assert response.status_code == 200
+    assert {"token", "refresh_token"} <= set(response.json)
+
+    wrong = client.post("/login", json={"email": email, "password": "wrong-password"})
+    assert wrong.status_code == 401
+
+
+
+def test_login_bootstrap_returns_dashboard_data(client):
+    credentials = {"email": unique_email(), "password": "password123"}
+    client.post("/register", json=credentials)
+
+    response = client.post("/login", json={**credentials, "bootstrap": True})
+    bootstrap = response.json["bootstrap"]
+    assert bootstrap["books"] == []
+    assert bootstrap["stats"] == {"total": 0, "read": 0, "unread": 0}
+
+
+# Books
+
+def test_book_crud(client, user, add_book):
+    book_id = add_book(title="Emma")
+
+    book = client.get(f"/book/{book_id}", headers=user["headers"]).json
+    assert book["title"] == "Emma"
+
+    update = client.put(f"/update_book/{book_id}", json={"read": True}, headers=user["headers"])
+    assert update.json["message"] == "Book updated successfully!"
+    assert client.get(f"/book/{book_id}", headers=user["headers"]).json["read"] is True
+
+    assert client.delete(f"/delete_book/{book_id}", headers=user["headers"]).status_code == 200
+    assert client.get(f"/book/{book_id}", headers=user["headers"]).status_code == 404
+
+
+def test_add_book_validates_fields(client, user):
+    response = client.post("/add_book", json={"title": "No author"}, headers=user["headers"])
+    assert response.status_code == 400
+    response = client.post("/add_book", json={"title": "T", "author": "A", "year": 3000}, headers=user["headers"])
+    assert response.status_code == 400
+
+
+def test_books_are_private(client, user, add_book, app):
+    book_id = add_book()
+    with app.app_context():
+        other = {"Authorization": f"Bearer {issue_tokens(unique_email())['token']}"}
+
+    assert client.get(f"/book/{book_id}", headers=other).status_code == 404
+    assert client.delete(f"/delete_book/{book_id}", headers=other).status_code == 404
+    assert client.get("/books", headers=other).json["total"] == 0
+
+
+def test_books_sort_and_stats(client, user, add_book):
+    add_book(title="banana", read=True)
+    add_book(title="Apple")
+    add_book(title="cherry")
+
+    response = client.get("/books?sort=title&order=asc&include_stats=true", headers=user["headers"])
+    assert [book["title"] for book in response.json["books"]] == ["Apple", "banana", "cherry"]
+    assert response.json["stats"] == {"total": 3, "read": 1, "unread": 2}
+
+    newest = client.get("/books?sort=created_at&order=desc&per_page=1", headers=user["headers"]).json
+    assert newest["books"][0]["title"] == "cherry"
+    assert newest["pages"] == 3
+
+    assert client.get("/books?sort=genre", headers=user["headers"]).status_code == 400
+
+
+def test_expired_deadline_is_rejected(client, user):
+    response = client.get("/books", headers={**user["headers"], "X-Request-Timeout-Ms": "0"})
+    assert response.status_code == 504
+
+
+@pytest.mark.parametrize("error, status", [
+    (ExecutionTimeout("operation exceeded time limit"), 504),
+    (NetworkTimeout("timed out"), 504),
+    (ServerSelectionTimeoutError("no servers"), 503),
+    (AutoReconnect("connection reset"), 503),
+    (ValueError("bug"), 500),
+])
+def test_storage_errors_map_to_statuses(client, user, monkeypatch, error, status):
+    def fail(*args, **kwargs):
+        raise error
+    monkeypatch.setattr(routes.repository, "count_books", fail)
+
+    assert client.get("/books", headers=user["headers"]).status_code == status
+
+
+def test_blocklist_lookup_errors_map_to_statuses(client, user, monkeypatch):
+    def fail(jti):
+        raise ServerSelectionTimeoutError("no servers")
+    monkeypatch.setattr(routes.repository, "is_access_token_revoked", fail)
+
+    assert client.get("/profile", headers=user["headers"]).status_code == 503
@@ -0,0 +1,141 @@
+import io
+from datetime import datetime, timezone, timedelta
+from storage import MemoryRepository
+
+
+def make_book(user, title, author="Someone", year=2000, read=False, minutes=0):
+    return {
+        "title": title,
+        "author": author,
+        "year": year,
+        "read": read,
+        "user": user,
+        "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=minutes),
+    }
+
+
+def test_books_are_scoped_to_their_user():
+    repository = MemoryRepository()
+    book_id = repository.add_book(make_book("a@example.com", "Mine"))
+    repository.add_book(make_book("b@example.com", "Theirs"))
+
+    assert repository.count_books("a@example.com") == 1
+    assert repository.get_book("a@example.com", book_id)["title"] == "Mine"
+    assert repository.get_book("b@example.com", book_id) is None
+    assert repository.delete_book("b@example.com", book_id) is False
+    assert repository.delete_book("a@example.com", book_id) is True
+    assert repository.count_books("a@example.com") == 0
+
+
+def test_list_books_sorts_and_pages():
+    repository = MemoryRepository()
+    user = "a@example.com"
+    for minutes, title in enumerate(["banana", "Apple", "cherry", "apple pie"]):
+        repository.add_book(make_book(user, title, minutes=minutes))
+
+    by_title = [book["title"] for book in repository.list_books(user, 0, 10, "title", "asc")]
+    assert by_title == ["Apple", "apple pie", "banana", "cherry"]
+
+    newest = [book["title"] for book in repository.list_books(user, 0, 2, "created_at", "desc")]
+    assert newest == ["apple pie", "cherry"]
+
+    # Pages never overlap and together cover every book
+    pages = [repository.list_books(user, skip, 2, "year", "asc") for skip in (0, 2)]
+    ids = [book["_id"] for page in pages for book in page]
+    assert len(set(ids)) == 4
+
+
+def test_list_books_returns_copies():
+    repository = MemoryRepository()
+    book_id = repository.add_book(make_book("a@example.com", "Original"))
+    repository.list_books("a@example.com", 0, 10)[0]["title"] = "Changed"
+    assert repository.get_book("a@example.com", book_id)["title"] == "Original"
+
+
+def test_count_read_books():
+    repository = MemoryRepository()
+    for read in (True, True, False):
+        repository.add_book(make_book("a@example.com", "Book", read=read))
+    assert repository.count_read_books("a@example.com") == 2
+
+
+def test_update_book_counts_updated_at_like_mongodb():
+    repository = MemoryRepository()
+    book_id = repository.add_book(make_book("a@example.com", "Same"))
+
+    # Same values but a new updated_at is still a modification
+    fields = {"title": "Same", "updated_at": datetime.now(timezone.utc)}
+    assert repository.update_book("a@example.com", book_id, fields) is True
+    assert repository.update_book("a@example.com", book_id, fields) is False
+    assert repository.update_book("b@example.com", book_id, {"title": "Other"}) is False
+
+
+def test_add_books_returns_one_id_per_book():
+    repository = MemoryRepository()
+    ids = repository.add_books([make_book("a@example.com", f"Book {i}") for i in range(3)])
+    assert len(set(ids)) == 3
+    assert repository.count_books("a@example.com") == 3
+
+
+def test_covers_round_trip():
+    repository = MemoryRepository()
+    cover_id = repository.save_cover("a@example.com", "book", io.BytesIO(b"image bytes"), "image/png")
+
+    cover = repository.open_cover(cover_id)
+    assert cover.length == 11
+    assert cover.read() == b"image bytes"
+
+    repository.delete_cover(cover_id)
+    assert repository.open_cover(cover_id) is None
+
+
+def refresh_token(jti, family, expires_in=timedelta(days=1)):
+    return {
+        "_id": jti,
+        "user": "a@example.com",
+        "family": family,
+        "revoked": False,
+        "expires_at": datetime.now(timezone.utc) + expires_in,
+    }
+
+
+def test_refresh_tokens_are_spent_once():
+    repository = MemoryRepository()
+    repository.save_refresh_token(refresh_token("one", "family"))
+
+    assert repository.spend_refresh_token("one", {"revoked": True})["family"] == "family"
+    assert repository.spend_refresh_token("one", {"revoked": True}) is None
+    assert repository.get_refresh_token("one")["revoked"] is True
+
+
+def test_revoking_a_family_revokes_every_token_in_it():
+    repository = MemoryRepository()
+    repository.save_refresh_token(refresh_token("one", "family"))
+    repository.save_refresh_token(refresh_token("two", "family"))
+    repository.save_refresh_token(refresh_token("other", "other family"))
+
+    repository.revoke_refresh_tokens("family", {"revoked": True, "reason": "logout"})
+
+    assert repository.get_refresh_token("one")["revoked"] is True
+    assert repository.get_refresh_token("two")["revoked"] is True
+    assert repository.get_refresh_token("other")["revoked"] is False
+
+
+def test_expired_refresh_tokens_are_dropped():
+    repository = MemoryRepository()
+    repository.save_refresh_token(refresh_token("old", "family", expires_in=timedelta(seconds=-1)))
+    repository.save_refresh_token(refresh_token("new", "family"))
+
+    assert repository.get_refresh_token("old") is None
+    assert repository.get_refresh_token("new") is not None
+
+
+def test_revoked_access_tokens_expire():
+    repository = MemoryRepository()
+    now = datetime.now(timezone.utc)
+    repository.revoke_access_token("old", now - timedelta(seconds=1))
+    repository.revoke_access_token("current", now + timedelta(hours=1))
+
+    assert repository.is_access_token_revoked("current") is True
+    assert repository.is_access_token_revoked("old") is False
+    assert repository.is_access_token_revoked("never") is False
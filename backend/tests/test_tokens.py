@@ -0,0 +1,29 @@
+def test_logout_revokes_the_access_token(client, user):
+    assert client.get("/profile", headers=user["headers"]).status_code == 200
+    assert client.post("/logout", headers=user["headers"]).status_code == 200
+    assert client.get("/profile", headers=user["headers"]).status_code == 401
+
+
+def test_refresh_rotates_the_refresh_token(client, user):
+    response = client.post("/refresh", headers={"Authorization": f"Bearer {user['refresh_token']}"})
+    assert response.status_code == 200
+    assert response.json["refresh_token"] != user["refresh_token"]
+
+    rotated = client.post("/refresh", headers={"Authorization": f"Bearer {response.json['refresh_token']}"})
+    assert rotated.status_code == 200
+
+
+def test_reused_refresh_token_ends_the_login(client, user):
+    first = client.post("/refresh", headers={"Authorization": f"Bearer {user['refresh_token']}"}).json
+
+    # The spent token comes back: the whole family is revoked, including the new one
+    reused = client.post("/refresh", headers={"Authorization": f"Bearer {user['refresh_token']}"})
+    assert reused.status_code == 401
+    newest = client.post("/refresh", headers={"Authorization": f"Bearer {first['refresh_token']}"})
+    assert newest.status_code == 401
+
+
+def test_logout_ends_the_refresh_token_family(client, user):
+    client.post("/logout", headers=user["headers"])
+    response = client.post("/refresh", headers={"Authorization": f"Bearer {user['refresh_token']}"})
+    assert response.status_code == 401
@@ -0,0 +1,90 @@
+import contextlib
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import pytest
+from storage import MemoryRepository
+from write_batcher import BookWriteBatcher
+
+
+class RecordingRepository(MemoryRepository):
+    # Records the deadline every add_books call ran under
+    def __init__(self, block=None):
+        super().__init__()
+        self.block = block
+        self.deadlines = []
+        self._current = None
+
+    @contextlib.contextmanager
+    def deadline(self, seconds):
+        self._current = seconds
+        yield
+
+    def add_books(self, books):
+        self.deadlines.append(self._current)
+        if self.block is not None:
+            self.block.wait()
+        return super().add_books(books)
+
+
+def test_worker_starts_on_first_write():
+    # Threads do not survive gunicorn's fork, so nothing may start at construction
+    batcher = BookWriteBatcher(MemoryRepository(), window_ms=1, max_batch=10)
+    assert batcher.worker is None
+
+    batcher.add_book({"user": "a@example.com", "title": "T"})
+    assert batcher.worker.is_alive()
+
+
+def test_concurrent_writes_are_coalesced():
+    repository = MemoryRepository()
+    batcher = BookWriteBatcher(repository, window_ms=50, max_batch=100)
+
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        ids = list(executor.map(
+            lambda i: batcher.add_book({"user": "a@example.com", "title": f"Book {i}"}, timeout=5),
+            range(100)
+        ))
+
+    assert len(set(ids)) == 100
+    assert repository.count_books("a@example.com") == 100
+    stats = batcher.stats()
+    assert stats["books"] == 100
+    assert stats["batches"] < 100
+
+
+def test_write_runs_under_the_longest_remaining_deadline():
+    repository = RecordingRepository()
+    batcher = BookWriteBatcher(repository, window_ms=1, max_batch=10)
+
+    batcher.add_book({"user": "a@example.com", "title": "T"}, timeout=5)
+    assert 0 < repository.deadlines[-1] <= 5
+
+    batcher.add_book({"user": "a@example.com", "title": "T"})
+    assert repository.deadlines[-1] is None
+
+
+def test_timeout_raises_a_timeout_error():
+    release = threading.Event()
+    batcher = BookWriteBatcher(RecordingRepository(block=release), window_ms=1, max_batch=10)
+    try:
+        with pytest.raises(TimeoutError, match="Timed out"):
+            batcher.add_book({"user": "a@example.com", "title": "T"}, timeout=0.05)
+    finally:
+        release.set()
+
+
+def test_expired_books_are_not_written():
+    repository = MemoryRepository()
+    batcher = BookWriteBatcher(repository, window_ms=1, max_batch=10)
+    expired, live = Future(), Future()
+    now = time.monotonic()
+
+    batcher._flush([
+        ({"user": "a@example.com", "title": "Late"}, expired, now - 2, now - 1),
+        ({"user": "a@example.com", "title": "On time"}, live, now, now + 5),
+    ])
+
+    assert isinstance(expired.exception(), TimeoutError)
+    assert live.result()
+    assert [book["title"] for book in repository.list_books("a@example.com", 0, 10)] == ["On time"]
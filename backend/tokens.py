@@ -0,0 +1,64 @@
+import uuid
+from datetime import datetime, timezone, timedelta
+from flask_jwt_extended import create_access_token, create_refresh_token, decode_token
+from storage import get_repository
+
+REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+
+
+# 📌 Issue an access/refresh pair; every refresh token of one login shares a family
+def issue_tokens(email, family=None):
+    family = family or uuid.uuid4().hex
+    claims = {"rf": family}
+    access_token = create_access_token(identity=email, additional_claims=claims)
+    refresh_token = create_refresh_token(identity=email, additional_claims=claims)
+
+    payload = decode_token(refresh_token)
+    get_repository().save_refresh_token({
+        "_id": payload["jti"],
+        "user": email,
+        "family": family,
+        "revoked": False,
+        "created_at": datetime.now(timezone.utc),
+        "expires_at": datetime.fromtimestamp(payload["exp"], timezone.utc)
+    })
+    return {"token": access_token, "refresh_token": refresh_token}
+
+
+# 📌 Exchange a refresh token for a new pair; the old refresh token is spent
+def rotate_tokens(jwt_payload):
+    spent = get_repository().spend_refresh_token(
+        jwt_payload["jti"],
+        {"revoked": True, "reason": "rotated", "revoked_at": datetime.now(timezone.utc)}
+    )
+    if spent is None:
+        return None
+    return issue_tokens(jwt_payload["sub"], family=spent["family"])
+
+
+def revoke_family(family, reason="logout"):
+    get_repository().revoke_refresh_tokens(
+        family,
+        {"revoked": True, "reason": reason, "revoked_at": datetime.now(timezone.utc)}
+    )
+
+
+# Access tokens are blocked in storage, so a logout reaches every worker
+def revoke_access_token(jwt_payload):
+    get_repository().revoke_access_token(
+        jwt_payload["jti"],
+        datetime.fromtimestamp(jwt_payload["exp"], timezone.utc)
+    )
+
+
+def is_token_revoked(jwt_payload):
+    if jwt_payload.get("type") != "refresh":
+        return get_repository().is_access_token_revoked(jwt_payload["jti"])
+
+    stored = get_repository().get_refresh_token(jwt_payload["jti"])
+    if stored is None:
+        return True
+    if stored["revoked"] and stored.get("reason") == "rotated":
+        # A spent refresh token came back: assume it leaked and end the whole login
+        revoke_family(stored["family"], reason="reuse")
+    return stored["revoked"]
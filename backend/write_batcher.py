@@ -0,0 +1,114 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Opt-in: coalesce concurrent add_book inserts into one insert_many
+WRITE_COALESCING = os.getenv("WRITE_COALESCING", "False").lower() == "true"
+# Longest a book waits for others to join its batch, and the largest batch
+WRITE_BATCH_WINDOW_MS = float(os.getenv("WRITE_BATCH_WINDOW_MS", 5))
+WRITE_BATCH_MAX = int(os.getenv("WRITE_BATCH_MAX", 100))
+
+
+class BookWriteBatcher:
+    def __init__(self, repository, window_ms, max_batch):
+        self.repository = repository
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.batch_sizes = Counter()
+        self.books_written = 0
+        self.total_wait = 0.0
+        self.worker = None
+
+    # 📌 Queue a book and block until its batch is written; returns the new book id
+    def add_book(self, book, timeout=None):
+        self._start_worker()
+        future = Future()
+        queued_at = time.monotonic()
+        deadline = None if timeout is None else queued_at + timeout
+        self.queue.put((book, future, queued_at, deadline))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise TimeoutError("Timed out waiting for the book to be saved")
+
+    def _start_worker(self):
+        # Started on first use, not at import: gunicorn preloads the app in the
+        # master, and threads do not survive the fork into workers
+        if self.worker is None or not self.worker.is_alive():
+            with self.lock:
+                if self.worker is None or not self.worker.is_alive():
+                    self.worker = threading.Thread(target=self._run, name="book-write-batcher", daemon=True)
+                    self.worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            # The first book opens the window; flush when it closes or the batch is full
+            flush_at = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = flush_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        # Books whose request already gave up are not written
+        now = time.monotonic()
+        expired = [item for item in batch if item[3] is not None and item[3] <= now]
+        batch = [item for item in batch if item[3] is None or item[3] > now]
+        for _, future, _, _ in expired:
+            future.set_exception(TimeoutError("Timed out waiting for the book to be saved"))
+        if not batch:
+            return
+
+        # The write gets the most time any request in the batch has left
+        deadlines = [deadline for _, _, _, deadline in batch]
+        seconds = None if None in deadlines else max(deadlines) - now
+        books = [book for book, _, _, _ in batch]
+        try:
+            with self.repository.deadline(seconds):
+                results = self.repository.add_books(books)
+        except Exception as e:
+            results = [e] * len(batch)
+
+        now = time.monotonic()
+        with self.lock:
+            self.batch_sizes[len(batch)] += 1
+            self.books_written += len(batch)
+            self.total_wait += sum(now - queued_at for _, _, queued_at, _ in batch)
+
+        for (_, future, _, _), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        with self.lock:
+            batches = sum(self.batch_sizes.values())
+            return {
+                "batches": batches,
+                "books": self.books_written,
+                "average_batch_size": self.books_written / batches if batches else 0,
+                "average_wait_ms": self.total_wait * 1000 / self.books_written if self.books_written else 0,
+                "batch_sizes": {str(size): count for size, count in sorted(self.batch_sizes.items())}
+            }
+
+
+def create_write_batcher(repository):
+    if not WRITE_COALESCING:
+        return None
+    return BookWriteBatcher(repository, WRITE_BATCH_WINDOW_MS, WRITE_BATCH_MAX)
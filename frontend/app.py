@@ -1,12 +1,47 @@
+import os
+import time
+
+# Startup timing report (STARTUP_REPORT=true): import time per module and
+# per-rerun script time, printed to the server log
+STARTUP_REPORT = os.getenv("STARTUP_REPORT", "False").lower() == "true"
+RERUN_START = time.perf_counter()
+import_times = {}
+
 import streamlit as st
+import_times["streamlit"] = time.perf_counter() - RERUN_START
+_import_started = time.perf_counter()
 import requests
-import pandas as pd
+import_times["requests"] = time.perf_counter() - _import_started
 from datetime import datetime
 import json
-import time
+import threading
+import socket
+from collections import deque
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+from urllib3.util.connection import allowed_gai_family
 
 # API URL - Flask backend URL
 API_URL = "https://library-management-server.up.railway.app"
+# Request timeouts in seconds; the read timeout is also sent as the server-side deadline
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", 3.05))
+API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", 10))
+# Circuit breaker: stop calling a failing backend for a while
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 3))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", 30))
+# Only statuses that mean the backend itself is down or overloaded open the circuit;
+# a 500 from one user's bad data must not cut off every session
+CIRCUIT_FAILURE_STATUSES = {502, 503, 504}
+# API latency instrumentation: sidebar debug panel (or ?debug=1) and optional JSON-lines log
+API_DEBUG_PANEL = os.getenv("API_DEBUG_PANEL", "False").lower() == "true"
+API_TIMING_LOG = os.getenv("API_TIMING_LOG")
+API_TIMING_HISTORY = 200
+# A session that has not rerun for this long (closed tab) stops its event stream
+EVENT_LISTENER_IDLE_SECONDS = float(os.getenv("EVENT_LISTENER_IDLE_SECONDS", 60))
+# An own edit whose event has not arrived by then produced none
+EXPECTED_EVENT_SECONDS = API_READ_TIMEOUT + 5
 
 # Page configuration
 st.set_page_config(
@@ -19,6 +54,8 @@ st.set_page_config(
 # Initialize session state variables if they don't exist
 if 'token' not in st.session_state:
     st.session_state.token = None
+if 'refresh_token' not in st.session_state:
+    st.session_state.refresh_token = None
 if 'user_email' not in st.session_state:
     st.session_state.user_email = None
 if 'current_page' not in st.session_state:
@@ -33,6 +70,11 @@ if 'book_to_edit' not in st.session_state:
     st.session_state.book_to_edit = None
 if 'search_query' not in st.session_state:
     st.session_state.search_query = ""
+if 'book_sort' not in st.session_state:
+    st.session_state.book_sort = ("created_at", "asc")
+# Library-wide read/unread totals from the server (dashboard)
+if 'library_stats' not in st.session_state:
+    st.session_state.library_stats = None
 if 'book_to_delete' not in st.session_state:
     st.session_state.book_to_delete = None
 # Notification system
@@ -42,105 +84,25 @@ if 'notification_type' not in st.session_state:
     st.session_state.notification_type = None
 if 'notification_time' not in st.session_state:
     st.session_state.notification_time = None
+# Library change events
+if 'event_listener' not in st.session_state:
+    st.session_state.event_listener = None
+if 'books_key' not in st.session_state:
+    st.session_state.books_key = None
+# Optimistic mutations waiting for the server
+if 'pending_mutations' not in st.session_state:
+    st.session_state.pending_mutations = []
+# Rolling API call timings for the debug panel
+if 'api_timings' not in st.session_state:
+    st.session_state.api_timings = deque(maxlen=API_TIMING_HISTORY)
 
-# Custom CSS
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 2.5rem;
-        color: #1E3A8A;
-        text-align: center;
-        margin-bottom: 1rem;
-    }
-    .sub-header {
-        font-size: 1.8rem;
-        color: #1E3A8A;
-        margin-bottom: 1rem;
-    }
-    .card {
-        background-color: #f8f9fa;
-        border-radius: 10px;
-        padding: 20px;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        margin-bottom: 20px;
-    }
-    .book-title {
-        font-size: 1.3rem;
-        font-weight: bold;
-        color: #1E3A8A;
-    }
-    .book-author {
-        font-style: italic;
-        color: #4B5563;
-    }
-    .book-year {
-        color: #6B7280;
-    }
-    .book-genre {
-        background-color: #E5E7EB;
-        padding: 5px 10px;
-        border-radius: 15px;
-        font-size: 0.8rem;
-    }
-    .read-status {
-        font-weight: bold;
-    }
-    .read-yes {
-        color: #10B981;
-    }
-    .read-no {
-        color: #EF4444;
-    }
-    .btn-primary {
-        background-color: #1E3A8A;
-        color: white;
-    }
-    .btn-danger {
-        background-color: #EF4444;
-        color: white;
-    }
-    .btn-success {
-        background-color: #10B981;
-        color: white;
-    }
-    .pagination {
-        display: flex;
-        justify-content: center;
-        margin-top: 20px;
-    }
-    .notification {
-        position: fixed;
-        top: 20px;
-        right: 20px;
-        z-index: 9999;
-        padding: 15px 25px;
-        border-radius: 10px;
-        box-shadow: 0 4px 12px rgba(0, 0, 0, 0.15);
-        animation: fadeIn 0.3s, fadeOut 0.3s 3.7s;
-        width: 300px;
-    }
-    .notification-success {
-        background-color: #10B981;
-        color: white;
-    }
-    .notification-error {
-        background-color: #EF4444;
-        color: white;
-    }
-    .notification-info {
-        background-color: #3B82F6;
-        color: white;
-    }
-    @keyframes fadeIn {
-        from {opacity: 0;}
-        to {opacity: 1;}
-    }
-    @keyframes fadeOut {
-        from {opacity: 1;}
-        to {opacity: 0;}
-    }
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS (read from disk once per process, not on every rerun)
+@st.cache_resource
+def load_css():
+    with open(os.path.join(os.path.dirname(__file__), "style.css")) as f:
+        return f"<style>\n{f.read()}</style>"
+
+st.markdown(load_css(), unsafe_allow_html=True)
 
 # Notification system
 def show_notification(message, type="success"):
@@ -168,36 +130,356 @@ def display_notification():
         """
         st.markdown(notification_html, unsafe_allow_html=True)
 
+# Circuit breaker shared by every session in this process
+class CircuitOpenError(requests.RequestException):
+    pass
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def before_request(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_seconds or self.trial_in_flight:
+                raise CircuitOpenError("The server is not responding. Please try again shortly.")
+            # Half-open: let one trial request through
+            self.trial_in_flight = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def is_open(self):
+        return self.opened_at is not None
+
+@st.cache_resource
+def get_circuit_breaker():
+    return CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS)
+
+circuit_breaker = get_circuit_breaker()
+
+# API latency instrumentation
+# Connection phases are timed by urllib3 connection subclasses into the calling
+# thread's timing record; reused keep-alive connections report zero for them.
+call_timings = threading.local()
+
+def record_phase(phase, seconds):
+    timings = getattr(call_timings, "current", None)
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0) + seconds * 1000
+
+class TimedHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        # Resolve here so DNS and TCP connect are timed separately, with the same
+        # address family filter urllib3 uses
+        host = self._dns_host
+        started = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(host, self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror:
+            addresses = []  # Let urllib3 raise its own resolution error
+        resolved = time.perf_counter()
+        record_phase("dns_ms", resolved - started)
+        try:
+            if not addresses:
+                return super()._new_conn()
+            # Try every address in order, as urllib3's create_connection does, so an
+            # unreachable IPv6 address still falls back to IPv4
+            for i, address in enumerate(addresses):
+                self._dns_host = address[4][0]
+                try:
+                    return super()._new_conn()
+                except ConnectTimeoutError:  # Includes NewConnectionError
+                    if i == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = host
+            record_phase("connect_ms", time.perf_counter() - resolved)
+
+class TimedHTTPSConnection(TimedHTTPConnection, HTTPSConnection):
+    def connect(self):
+        started = time.perf_counter()
+        before = dict(getattr(call_timings, "current", None) or {})
+        super().connect()
+        # Whatever connect() spent beyond DNS and TCP is the TLS handshake
+        after = getattr(call_timings, "current", None) or {}
+        socket_ms = sum(after.get(phase, 0) - before.get(phase, 0) for phase in ("dns_ms", "connect_ms"))
+        record_phase("tls_ms", max(0, (time.perf_counter() - started) - socket_ms / 1000))
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+@st.cache_resource
+def get_http_session():
+    # One keep-alive session per process, so most calls skip DNS/TCP/TLS entirely
+    session = requests.Session()
+    adapter = TimedHTTPAdapter()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+http = get_http_session()
+timing_log_lock = threading.Lock()
+
+def log_timing(timing):
+    if not API_TIMING_LOG:
+        return
+    with timing_log_lock:
+        with open(API_TIMING_LOG, "a") as f:
+            f.write(json.dumps(timing) + "\n")
+
+def record_api_timing(response):
+    # Called from the script thread; background requests are recorded when reconciled
+    timing = getattr(response, "timing", None)
+    if timing is not None:
+        st.session_state.api_timings.append(timing)
+
 # Helper functions for API calls
-def make_api_request(endpoint, method="GET", data=None, token=None, params=None):
+def make_api_request(endpoint, method="GET", data=None, token=None, params=None, files=None):
+    response = send_api_request(endpoint, method, data, token, params, files)
+    record_api_timing(response)
+    
+    # Access token expired: refresh it silently and retry once
+    if response.status_code == 401 and token and token == st.session_state.token and refresh_access_token():
+        response = send_api_request(endpoint, method, data, st.session_state.token, params, files)
+        record_api_timing(response)
+    
+    return response
+
+def refresh_access_token():
+    if not st.session_state.refresh_token:
+        return False
+    try:
+        response = send_api_request("refresh", method="POST", data={}, token=st.session_state.refresh_token)
+    except requests.RequestException:
+        return False
+    record_api_timing(response)
+    
+    if response.status_code != 200:
+        # Refresh token expired or revoked: the user has to log in again
+        st.session_state.refresh_token = None
+        return False
+    
+    tokens = response.json()
+    st.session_state.token = tokens["token"]
+    st.session_state.refresh_token = tokens["refresh_token"]
+    # The event stream was authorized with the old access token
+    if st.session_state.event_listener:
+        start_event_listener()
+    return True
+
+def send_api_request(endpoint, method="GET", data=None, token=None, params=None, files=None):
     url = f"{API_URL}/{endpoint}"
-    headers = {}
+    # Leave the server a little less than our read timeout so it gives up first
+    headers = {"X-Request-Timeout-Ms": str(int(API_READ_TIMEOUT * 1000 * 0.9))}
+    timeout = (API_CONNECT_TIMEOUT, API_READ_TIMEOUT)
     
     if token:
         headers["Authorization"] = f"Bearer {token}"
     
-    if method == "GET":
-        response = requests.get(url, headers=headers, params=params)
-    elif method == "POST":
-        headers["Content-Type"] = "application/json"
-        response = requests.post(url, headers=headers, data=json.dumps(data))
-    elif method == "PUT":
-        headers["Content-Type"] = "application/json"
-        response = requests.put(url, headers=headers, data=json.dumps(data))
-    elif method == "DELETE":
-        response = requests.delete(url, headers=headers)
+    circuit_breaker.before_request()
+    body = None
+    timing = {"endpoint": endpoint.split("/")[0], "method": method, "dns_ms": 0, "connect_ms": 0, "tls_ms": 0}
+    call_timings.current = timing
+    started = time.perf_counter()
+    try:
+        if method == "GET":
+            response = http.get(url, headers=headers, params=params, timeout=timeout)
+        elif method == "POST" and files:
+            # Multipart upload; requests sets the Content-Type boundary
+            response = http.post(url, headers=headers, files=files, timeout=timeout)
+        elif method == "POST":
+            headers["Content-Type"] = "application/json"
+            body = json.dumps(data)
+            response = http.post(url, headers=headers, data=body, timeout=timeout)
+        elif method == "PUT":
+            headers["Content-Type"] = "application/json"
+            body = json.dumps(data)
+            response = http.put(url, headers=headers, data=body, timeout=timeout)
+        elif method == "DELETE":
+            response = http.delete(url, headers=headers, timeout=timeout)
+    except requests.RequestException:
+        circuit_breaker.record_failure()
+        raise
+    finally:
+        call_timings.current = None
+    
+    # elapsed runs from sending until the response headers are parsed
+    setup_ms = timing["dns_ms"] + timing["connect_ms"] + timing["tls_ms"]
+    timing.update({
+        "at": datetime.now().isoformat(timespec="seconds"),
+        "status": response.status_code,
+        "ttfb_ms": max(0, response.elapsed.total_seconds() * 1000 - setup_ms),
+        "total_ms": (time.perf_counter() - started) * 1000,
+        "request_bytes": len(body or ""),
+        "response_bytes": len(response.content),
+    })
+    response.timing = timing
+    log_timing(timing)
     
+    if response.status_code in CIRCUIT_FAILURE_STATUSES:
+        circuit_breaker.record_failure()
+    else:
+        circuit_breaker.record_success()
     return response
 
+# Library change events (SSE)
+class LibraryEventListener:
+    def __init__(self, token):
+        self.token = token
+        self.changed = threading.Event()
+        self.changed.set()  # First render always fetches
+        self.stopped = threading.Event()
+        self.timed_out = False
+        self.server_busy = False
+        self.last_seen = time.monotonic()
+        self.expected = {}  # book_id -> expiry times of events caused by this session's own mutations
+        self.expected_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def touch(self):
+        # Called on every rerun; without them the session is gone
+        self.last_seen = time.monotonic()
+
+    def expect(self, book_id):
+        with self.expected_lock:
+            self.expected.setdefault(book_id, []).append(time.monotonic() + EXPECTED_EVENT_SECONDS)
+
+    def forget(self, book_id):
+        with self.expected_lock:
+            expiries = self.expected.get(book_id)
+            if expiries:
+                expiries.pop(0)
+            if not expiries:
+                self.expected.pop(book_id, None)
+
+    def _is_expected(self, book_id):
+        now = time.monotonic()
+        with self.expected_lock:
+            # Expectations whose event never came (e.g. "No changes made") lapse
+            expiries = [expiry for expiry in self.expected.pop(book_id, []) if expiry > now]
+            if not expiries:
+                return False
+            if len(expiries) > 1:
+                self.expected[book_id] = expiries[1:]
+            return True
+
+    def _should_stop(self):
+        if not self.stopped.is_set() and time.monotonic() - self.last_seen > EVENT_LISTENER_IDLE_SECONDS:
+            self.timed_out = True
+            self.stopped.set()
+        return self.stopped.is_set()
+
+    def _run(self):
+        headers = {"Authorization": f"Bearer {self.token}", "Accept": "text/event-stream"}
+        while not self._should_stop():
+            try:
+                with requests.get(f"{API_URL}/events", headers=headers, stream=True, timeout=(5, 60)) as response:
+                    if response.status_code == 503:
+                        # Every stream slot on the server is taken: poll, then try again
+                        self.server_busy = True
+                        self.changed.set()
+                        self.stopped.wait(float(response.headers.get("Retry-After", 30)))
+                        continue
+                    if response.status_code != 200:
+                        # Token expired or endpoint unavailable: fall back to refetching
+                        self.changed.set()
+                        return
+                    if self.server_busy:
+                        self.server_busy = False
+                        self.changed.set()
+                    # The server sends a keep-alive comment at least every 15s,
+                    # so an idle session is noticed even when nothing changes
+                    for line in response.iter_lines(decode_unicode=True):
+                        if self._should_stop():
+                            return
+                        if line and line.startswith("data:"):
+                            # Our own optimistic edits are already applied locally
+                            event = json.loads(line[len("data:"):])
+                            if not self._is_expected(event.get("book_id")):
+                                self.changed.set()
+            except requests.RequestException:
+                # Events may have been missed while disconnected
+                self.changed.set()
+            self.stopped.wait(3)
+
+    def is_alive(self):
+        # A listener without a stream cannot report changes, so callers refetch
+        return self.thread.is_alive() and not self.stopped.is_set() and not self.server_busy
+
+    def stop(self):
+        self.stopped.set()
+
+def start_event_listener(initial_fetch=True):
+    books_key = st.session_state.books_key
+    stop_event_listener()
+    st.session_state.event_listener = LibraryEventListener(st.session_state.token)
+    if not initial_fetch:
+        # The books we already hold are current (login bootstrap)
+        st.session_state.event_listener.changed.clear()
+        st.session_state.books_key = books_key
+
+def stop_event_listener():
+    if st.session_state.event_listener:
+        st.session_state.event_listener.stop()
+    st.session_state.event_listener = None
+    st.session_state.books_key = None
+
+def mark_books_stale():
+    st.session_state.books_key = None
+
+def books_need_refresh(key):
+    # A refetch now could return the book list without in-flight edits
+    if st.session_state.pending_mutations and st.session_state.books_key == key:
+        return False
+    listener = st.session_state.event_listener
+    if listener is None or not listener.is_alive():
+        return True
+    return listener.changed.is_set() or st.session_state.books_key != key
+
 def login_user(email, password):
     try:
-        response = make_api_request("login", method="POST", data={"email": email, "password": password})
+        # Ask for the dashboard data in the same round trip as the login
+        response = make_api_request("login", method="POST", data={"email": email, "password": password, "bootstrap": True})
         
         if response.status_code == 200:
             data = response.json()
             st.session_state.token = data["token"]
+            st.session_state.refresh_token = data.get("refresh_token")
             st.session_state.user_email = email
             st.session_state.current_page = "dashboard"
+            bootstrap = data.get("bootstrap")
+            if bootstrap:
+                store_books_page(bootstrap, (1, 10, *DASHBOARD_SORT, True))
+            start_event_listener(initial_fetch=not bootstrap)
             show_notification(f"Welcome back, {email}!", "success")
             return True, "Login successful!"
         else:
@@ -225,26 +507,62 @@ def logout_user():
             make_api_request("logout", method="POST", token=st.session_state.token)
         
         # Clear session state
+        stop_event_listener()
         user_email = st.session_state.user_email
         st.session_state.token = None
+        st.session_state.refresh_token = None
         st.session_state.user_email = None
         st.session_state.current_page = "login"
         st.session_state.books = []
+        st.session_state.library_stats = None
+        st.session_state.pending_mutations = []
         show_notification(f"Goodbye, {user_email}! You've been logged out.", "info")
         return True, "Logout successful!"
     except Exception as e:
         return False, f"Error during logout: {str(e)}"
 
-def get_books(page=1, per_page=10):
+# Book list orderings, sorted by the server
+SORT_OPTIONS = {
+    "Oldest first": ("created_at", "asc"),
+    "Recently added": ("created_at", "desc"),
+    "Title (A-Z)": ("title", "asc"),
+    "Author (A-Z)": ("author", "asc"),
+    "Year (newest)": ("year", "desc"),
+    "Unread first": ("read", "asc"),
+}
+
+# Dashboard view: newest books first, plus library-wide read/unread totals
+DASHBOARD_SORT = ("created_at", "desc")
+
+def store_books_page(data, key):
+    st.session_state.books = data.get("books", [])
+    st.session_state.page_num = data.get("page", 1)
+    st.session_state.total_pages = data.get("pages", 1)
+    if "stats" in data:
+        st.session_state.library_stats = data["stats"]
+    st.session_state.books_key = key
+
+def get_books(page=1, per_page=10, sort=None, include_stats=False):
     try:
-        params = {"page": page, "per_page": per_page}
+        sort_field, order = sort or st.session_state.book_sort
+        
+        # Skip the refetch when the event stream reports no changes since the last one
+        key = (page, per_page, sort_field, order, include_stats)
+        if not books_need_refresh(key):
+            return True, "Books are up to date."
+        
+        listener = st.session_state.event_listener
+        if listener:
+            listener.changed.clear()  # Events arriving during the fetch mark it stale again
+        st.session_state.books_key = None
+        
+        params = {"page": page, "per_page": per_page, "sort": sort_field, "order": order}
+        if include_stats:
+            params["include_stats"] = "true"
         response = make_api_request("books", token=st.session_state.token, params=params)
         
         if response.status_code == 200:
-            data = response.json()
-            st.session_state.books = data.get("books", [])
-            st.session_state.page_num = data.get("page", 1)
-            st.session_state.total_pages = data.get("pages", 1)
+            store_books_page(response.json(), key)
             return True, "Books retrieved successfully!"
         else:
             error_msg = response.json().get("message", "Failed to retrieve books.")
@@ -265,6 +583,7 @@ def add_book(title, author, year, genre, read):
         response = make_api_request("add_book", method="POST", data=data, token=st.session_state.token)
         
         if response.status_code == 201:
+            mark_books_stale()
             show_notification(f"Book '{title}' has been added to your library!", "success")
             return True, "Book added successfully!"
         else:
@@ -273,40 +592,161 @@ def add_book(title, author, year, genre, read):
     except Exception as e:
         return False, f"Error connecting to server: {str(e)}"
 
-def update_book(book_id, title, author, year, genre, read):
-    try:
-        data = {
-            "title": title,
-            "author": author,
-            "year": year,
-            "genre": genre,
-            "read": read
-        }
+# Optimistic mutations: applied to st.session_state.books at once, sent in the
+# background, and rolled back on the next rerun if the server rejects them
+class PendingMutation:
+    def __init__(self, book_id, endpoint, method, data, token, old_book, index, description):
+        self.book_id = book_id
+        self.endpoint = endpoint
+        self.method = method
+        self.data = data
+        self.old_book = old_book
+        self.index = index
+        self.description = description
+        self.response = None
+        self.error = None
+        self.done = threading.Event()
+        threading.Thread(target=self._send, args=(token,), daemon=True).start()
+
+    def _send(self, token):
+        # Runs outside the script thread, so it must not touch st.session_state
+        try:
+            self.response = send_api_request(self.endpoint, self.method, self.data, token)
+        except requests.RequestException as e:
+            self.error = f"Error connecting to server: {str(e)}"
+        self.done.set()
+
+    def resend(self):
+        self.response = make_api_request(self.endpoint, self.method, self.data, token=st.session_state.token)
+
+    def succeeded(self):
+        return self.response is not None and self.response.status_code == 200
+
+    def error_message(self):
+        if self.error:
+            return self.error
+        try:
+            return self.response.json().get("message", "Request failed.")
+        except ValueError:
+            return f"Request failed with status {self.response.status_code}."
+
+def mutate_book_optimistically(book_id, endpoint, method, data, new_book, description):
+    books = st.session_state.books
+    index = next((i for i, book in enumerate(books) if book.get("_id") == book_id), None)
+    old_book = books[index] if index is not None else None
+    if index is not None:
+        if new_book is None:
+            books.pop(index)
+        else:
+            books[index] = new_book
+    
+    listener = st.session_state.event_listener
+    if listener:
+        listener.expect(book_id)
+    st.session_state.pending_mutations.append(
+        PendingMutation(book_id, endpoint, method, data, st.session_state.token, old_book, index, description)
+    )
+
+def rollback_mutation(mutation):
+    if mutation.old_book is None:
+        return
+    books = st.session_state.books
+    current = next((i for i, book in enumerate(books) if book.get("_id") == mutation.book_id), None)
+    if current is not None:
+        books[current] = mutation.old_book
+    else:
+        books.insert(min(mutation.index, len(books)), mutation.old_book)
+
+def reconcile_mutations():
+    still_pending = []
+    for mutation in st.session_state.pending_mutations:
+        if not mutation.done.is_set():
+            still_pending.append(mutation)
+            continue
+        if mutation.response is not None:
+            record_api_timing(mutation.response)
         
-        response = make_api_request(f"update_book/{book_id}", method="PUT", data=data, token=st.session_state.token)
+        # The access token expired mid-flight: refresh it and retry once
+        if mutation.response is not None and mutation.response.status_code == 401:
+            try:
+                mutation.resend()
+            except requests.RequestException as e:
+                mutation.error = f"Error connecting to server: {str(e)}"
         
-        if response.status_code == 200:
-            show_notification(f"Book '{title}' has been updated successfully!", "success")
-            return True, "Book updated successfully!"
-        else:
-            error_msg = response.json().get("message", "Failed to update book.")
-            return False, error_msg
-    except Exception as e:
-        return False, f"Error connecting to server: {str(e)}"
+        if not mutation.succeeded():
+            rollback_mutation(mutation)
+            if st.session_state.event_listener:
+                st.session_state.event_listener.forget(mutation.book_id)
+            show_notification(f"Could not {mutation.description} ({mutation.error_message()}). The change was undone.", "error")
+    st.session_state.pending_mutations = still_pending
+
+def update_book(book_id, title, author, year, genre, read):
+    data = {
+        "title": title,
+        "author": author,
+        "year": year,
+        "genre": genre,
+        "read": read
+    }
+    
+    current = next((book for book in st.session_state.books if book.get("_id") == book_id), None)
+    new_book = dict(current, **data) if current else None
+    mutate_book_optimistically(book_id, f"update_book/{book_id}", "PUT", data, new_book, f"update '{title}'")
+    show_notification(f"Book '{title}' has been updated successfully!", "success")
+    return True, "Book updated successfully!"
 
 def delete_book(book_id):
+    book = next((book for book in st.session_state.books if book.get("_id") == book_id), {})
+    mutate_book_optimistically(book_id, f"delete_book/{book_id}", "DELETE", None, None, f"delete '{book.get('title', 'book')}'")
+    show_notification(f"Book has been removed from your library.", "info")
+    return True, "Book deleted successfully!"
+
+def upload_cover(book_id, uploaded_file):
     try:
-        response = make_api_request(f"delete_book/{book_id}", method="DELETE", token=st.session_state.token)
+        listener = st.session_state.event_listener
+        if listener:
+            listener.expect(book_id)
+        files = {"cover": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
+        response = make_api_request(f"book/{book_id}/cover", method="POST", token=st.session_state.token, files=files)
         
-        if response.status_code == 200:
-            show_notification(f"Book has been removed from your library.", "info")
-            return True, "Book deleted successfully!"
+        if response.status_code == 201:
+            # Only the small cover reference lives on the book
+            cover = response.json().get("cover")
+            for book in st.session_state.books:
+                if book.get("_id") == book_id:
+                    book["cover"] = cover
+            return True, "Cover uploaded successfully!"
         else:
-            error_msg = response.json().get("message", "Failed to delete book.")
+            if listener:
+                listener.forget(book_id)
+            error_msg = response.json().get("message", "Failed to upload cover.")
             return False, error_msg
     except Exception as e:
         return False, f"Error connecting to server: {str(e)}"
 
+class ThumbnailUnavailable(Exception):
+    pass
+
+# Thumbnails never change for a given cover id, so cache them per process.
+# Failures raise instead of returning, so only real thumbnails are cached.
+@st.cache_data(max_entries=500, show_spinner=False)
+def fetch_cover_thumbnail(book_id, cover_id, size):
+    # The cover id in the URL lets the server mark the response immutable
+    response = make_api_request(
+        f"book/{book_id}/cover/thumbnail",
+        token=st.session_state.token,
+        params={"size": size, "v": cover_id}
+    )
+    if response.status_code != 200:
+        raise ThumbnailUnavailable(f"Thumbnail request failed with status {response.status_code}")
+    return response.content
+
+def get_cover_thumbnail(book_id, cover_id, size):
+    try:
+        return fetch_cover_thumbnail(book_id, cover_id, size)
+    except (ThumbnailUnavailable, requests.RequestException):
+        return None
+
 def get_book_by_id(book_id):
     try:
         response = make_api_request(f"book/{book_id}", token=st.session_state.token)
@@ -392,18 +832,77 @@ def render_sidebar():
             else:
                 st.error(message)
 
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def render_api_debug_panel():
+    if not (API_DEBUG_PANEL or st.query_params.get("debug") == "1"):
+        return
+    
+    with st.sidebar:
+        st.divider()
+        with st.expander("🛠️ API timings", expanded=False):
+            timings = list(st.session_state.api_timings)
+            if not timings:
+                st.caption("No API calls recorded yet.")
+                return
+            
+            totals = [timing["total_ms"] for timing in timings]
+            st.markdown(
+                f"**{len(timings)} calls** · p50 {percentile(totals, 0.5):.0f}ms · "
+                f"p95 {percentile(totals, 0.95):.0f}ms · max {max(totals):.0f}ms"
+            )
+            
+            # Histogram of total latency
+            buckets = [100, 250, 500, 1000, 2500, 5000]
+            histogram = {f"≤{bucket}ms": 0 for bucket in buckets}
+            histogram[f">{buckets[-1]}ms"] = 0
+            for total in totals:
+                label = next((f"≤{bucket}ms" for bucket in buckets if total <= bucket), f">{buckets[-1]}ms")
+                histogram[label] += 1
+            st.bar_chart(histogram)
+            
+            # Where the time goes, on average: network setup vs server vs download
+            phases = ["dns_ms", "connect_ms", "tls_ms", "ttfb_ms"]
+            averages = {phase: sum(timing[phase] for timing in timings) / len(timings) for phase in phases}
+            averages["download_ms"] = max(0, sum(totals) / len(totals) - sum(averages.values()))
+            st.caption(" · ".join(f"{phase[:-3]} {value:.0f}ms" for phase, value in averages.items()))
+            
+            st.dataframe(
+                [
+                    {
+                        "at": timing["at"],
+                        "call": f"{timing['method']} /{timing['endpoint']}",
+                        "status": timing["status"],
+                        "total ms": round(timing["total_ms"]),
+                        "ttfb ms": round(timing["ttfb_ms"]),
+                        "bytes": timing["response_bytes"],
+                    }
+                    for timing in reversed(timings[-20:])
+                ],
+                use_container_width=True,
+                hide_index=True
+            )
+
 def render_dashboard():
     st.markdown("<h1 class='main-header'>Dashboard</h1>", unsafe_allow_html=True)
     
-    # Refresh books data
-    get_books()
+    # Refresh books data (newest first, so the recent list is the top of the page)
+    success, message = get_books(sort=DASHBOARD_SORT, include_stats=True)
+    if not success and st.session_state.books:
+        st.warning(f"{message} Showing your last loaded books.")
     
     # Stats cards
     col1, col2, col3 = st.columns(3)
     
-    total_books = len(st.session_state.books)
-    read_books = sum(1 for book in st.session_state.books if book.get("read", False))
-    unread_books = total_books - read_books
+    stats = st.session_state.library_stats
+    if stats:
+        total_books, read_books, unread_books = stats["total"], stats["read"], stats["unread"]
+    else:
+        total_books = len(st.session_state.books)
+        read_books = sum(1 for book in st.session_state.books if book.get("read", False))
+        unread_books = total_books - read_books
     
     with col1:
         st.markdown("<div class='card'>", unsafe_allow_html=True)
@@ -424,12 +923,8 @@ def render_dashboard():
     st.markdown("<h2 class='sub-header'>Recently Added Books</h2>", unsafe_allow_html=True)
     
     if st.session_state.books:
-        # Sort books by created_at if available, otherwise just take the first few
-        recent_books = sorted(
-            st.session_state.books, 
-            key=lambda x: x.get("created_at", ""), 
-            reverse=True
-        )[:5]
+        # The server already returned them newest first
+        recent_books = st.session_state.books[:5]
         
         for book in recent_books:
             col1, col2 = st.columns([3, 1])
@@ -463,8 +958,6 @@ def render_delete_confirmation():
                 if success:
                     show_notification(f"Book '{book_title}' has been deleted.", "info")
                     st.session_state.book_to_delete = None
-                    # Refresh books after deletion
-                    get_books(page=st.session_state.page_num)
                     st.rerun()
                 else:
                     st.error(message)
@@ -481,8 +974,8 @@ def render_books_page():
         render_delete_confirmation()
         return
     
-    # Search and filter
-    col1, col2 = st.columns([3, 1])
+    # Search, filter and sort
+    col1, col2, col3 = st.columns([3, 1, 1])
     
     with col1:
         search_query = st.text_input("Search books by title or author", value=st.session_state.search_query)
@@ -491,12 +984,23 @@ def render_books_page():
     with col2:
         filter_option = st.selectbox("Filter by", ["All Books", "Read", "Unread"])
     
+    with col3:
+        sort_labels = list(SORT_OPTIONS)
+        current_label = next(label for label, value in SORT_OPTIONS.items() if value == st.session_state.book_sort)
+        sort_label = st.selectbox("Sort by", sort_labels, index=sort_labels.index(current_label))
+        if SORT_OPTIONS[sort_label] != st.session_state.book_sort:
+            st.session_state.book_sort = SORT_OPTIONS[sort_label]
+            st.session_state.page_num = 1
+    
     # Refresh books data
     success, message = get_books(page=st.session_state.page_num)
     
     if not success:
-        st.error(message)
-        return
+        if not st.session_state.books:
+            st.error(message)
+            return
+        # Backend degraded: keep showing the last books we loaded
+        st.warning(f"{message} Showing your last loaded books.")
     
     # Filter books based on search query and filter option
     filtered_books = st.session_state.books
@@ -516,7 +1020,15 @@ def render_books_page():
     # Display books
     if filtered_books:
         for book in filtered_books:
-            col1, col2, col3 = st.columns([3, 1, 1])
+            cover_col, col1, col2, col3 = st.columns([0.5, 3, 1, 1])
+            
+            with cover_col:
+                cover = book.get("cover")
+                thumbnail = get_cover_thumbnail(book.get("_id"), cover["id"], 128) if cover else None
+                if thumbnail:
+                    st.image(thumbnail, width=64)
+                else:
+                    st.markdown("📖")
             
             with col1:
                 st.markdown(f"<div class='book-title'>{book.get('title')}</div>", unsafe_allow_html=True)
@@ -653,6 +1165,7 @@ def render_edit_book_page():
                  "Mystery", "Thriller", "Romance", "Biography", 
                  "History", "Science", "Self-Help", "Other"].index(book.get("genre", "Fiction")))
         read = st.checkbox("I have read this book", value=book.get("read", False))
+        cover_file = st.file_uploader("Cover image", type=["jpg", "jpeg", "png", "webp", "gif"])
         
         col1, col2 = st.columns(2)
         
@@ -667,6 +1180,10 @@ def render_edit_book_page():
                 st.error("Title and author are required.")
             else:
                 success, message = update_book(book_id, title, author, year, genre, read)
+                if success and cover_file:
+                    cover_success, cover_message = upload_cover(book_id, cover_file)
+                    if not cover_success:
+                        show_notification(f"Book updated, but the cover upload failed: {cover_message}", "error")
                 if success:
                     st.session_state.book_to_edit = None
                     navigate_to("books")
@@ -679,8 +1196,50 @@ def render_edit_book_page():
             navigate_to("books")
             st.rerun()
 
+# Rerun when another session changes the library or an optimistic edit settles
+@st.fragment(run_every=2)
+def watch_library_changes():
+    if any(mutation.done.is_set() for mutation in st.session_state.pending_mutations):
+        st.rerun()
+    listener = st.session_state.event_listener
+    if listener is None:
+        return
+    if listener.timed_out:
+        # Reruns stopped for a while (e.g. a throttled background tab): reconnect
+        start_event_listener()
+        listener = st.session_state.event_listener
+    listener.touch()
+    if st.session_state.current_page not in ("dashboard", "books"):
+        return
+    if listener.is_alive() and listener.changed.is_set():
+        st.rerun()
+
+# Startup timing report
+@st.cache_resource
+def startup_stats():
+    # Shared by every session in this process
+    return {"reported": False, "reruns": 0, "total_ms": 0.0}
+
+def report_rerun_time():
+    if not STARTUP_REPORT:
+        return
+    stats = startup_stats()
+    rerun_ms = (time.perf_counter() - RERUN_START) * 1000
+    stats["reruns"] += 1
+    stats["total_ms"] += rerun_ms
+    if not stats["reported"]:
+        # Only the first run in a process pays for the imports
+        stats["reported"] = True
+        imports = ", ".join(f"{module} {seconds * 1000:.1f}ms" for module, seconds in import_times.items())
+        print(f"Startup report: first run {rerun_ms:.1f}ms (imports: {imports})", flush=True)
+    else:
+        print(f"Rerun {rerun_ms:.1f}ms (average {stats['total_ms'] / stats['reruns']:.1f}ms over {stats['reruns']} runs)", flush=True)
+
 # Main app logic
 def main():
+    # Settle finished optimistic edits before anything is drawn
+    reconcile_mutations()
+    
     # Display notification if exists
     display_notification()
     
@@ -703,6 +1262,12 @@ def main():
         else:
             # Default to dashboard
             render_dashboard()
+        
+        watch_library_changes()
+    
+    # Drawn last so it includes the calls made during this run
+    render_api_debug_panel()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
+    report_rerun_time()
\ No newline at end of file